@@ -21,4 +21,50 @@ RESOURCE_MIDDLEWARE = (
     'restlib.resources.middleware.client.UnsupportedMediaType',
     'restlib.resources.middleware.client.UnprocessableEntity',
     'restlib.resources.middleware.client.NotAcceptable',
+    'restlib.resources.middleware.client.SparseFieldsets',
+    'restlib.resources.middleware.redirection.NotModified',
 )
+
+# the cache backend used by ModelResource classes which define
+# ``representation_cache = True``. the LRU backend is local to each process,
+# while ``restlib.resources.cache.DjangoCacheBackend`` uses the default cache
+# defined by the Django ``CACHES`` setting
+REPRESENTATION_CACHE_BACKEND = 'restlib.resources.cache.LRUBackend'
+
+# the maximum number of representations held by the LRU backend
+REPRESENTATION_CACHE_SIZE = 10000
+
+# the maximum number of fieldsets requested by clients using the ``fields``
+# query parameter that are cached
+FIELDSET_CACHE_SIZE = 1000
+
+# the backend holding the generation of each model used by ModelResource
+# classes which define ``generation_etags = True``. a shared backend, e.g.
+# ``restlib.resources.cache.DjangoCacheBackend``, is required for multiple
+# processes. the generations of the LRU backend are seeded when first read,
+# so processes do not issue the same entity tags for different data
+GENERATION_BACKEND = 'restlib.resources.cache.LRUBackend'
+
+# the JSON library used by the JSON representation, e.g. 'json' or
+# 'simplejson'. if ``None``, the fastest library available is used. see
+# ``restlib.representations._json.BACKENDS``
+JSON_BACKEND = None
+
+# if true, the duration of each phase of a request, i.e. each middleware
+# processor, the resource method and the resolving and encoding of the content,
+# is recorded for all resources. this may be enabled per resource using the
+# ``timing`` attribute
+RESOURCE_TIMING = False
+
+# the sink the timings are recorded to. the default aggregates the timings in a
+# histogram per resource, method and phase. see ``restlib.resources.timing``
+TIMING_SINK = 'restlib.resources.timing.HistogramSink'
+
+# if true, the timings are sent to clients in the ``Server-Timing`` header
+SERVER_TIMING = False
+
+# the directory holding the metrics of each process when recording them with
+# ``restlib.resources.metrics.MetricsSink``, so the metrics of all processes on
+# the machine, e.g. pre-forked workers, are exported together. if ``None``,
+# the metrics are local to each process
+METRICS_DIR = None
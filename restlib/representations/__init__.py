@@ -1,6 +1,10 @@
 import warnings
 
-from restlib.representations import _json, _plain, _octet, _xml, _www
+from restlib.representations import (_json, _plain, _octet, _xml, _www,
+    _ndjson, _csv, _msgpack)
+
+# registers additional types for the JSON representation
+register_json_type = _json.register_type
 
 class Representation(object):
     library = {}
@@ -24,6 +28,19 @@ class Representation(object):
             raise KeyError, 'Encoder for %s not registered' % mimetype
         return self.library[mimetype].encode(data, **kwargs)
 
+    def encode_iter(self, mimetype, data, **kwargs):
+        """Encodes the iterable ``data`` incrementally and returns an iterator
+        of the encoded chunks. Encoders that do not define ``encode_iter``
+        encode the complete list at once.
+        """
+        if mimetype not in self.library:
+            raise KeyError, 'Encoder for %s not registered' % mimetype
+
+        encoder = self.library[mimetype]
+        if hasattr(encoder, 'encode_iter'):
+            return encoder.encode_iter(data, **kwargs)
+        return iter([encoder.encode(list(data), **kwargs)])
+
     def decode(self, mimetype, data, **kwargs):
         if mimetype not in self.library:
             raise KeyError, 'Decoder for %s not registered' % mimetype
@@ -47,3 +64,6 @@ representation.register('application/octet-stream', _octet.OctetStream)
 representation.register('text/plain', _plain.PlainText)
 representation.register('application/json', _json.JSON)
 representation.register('application/xml', _xml.DataOrientedXML)
+representation.register('application/x-ndjson', _ndjson.NDJSON)
+representation.register('text/csv', _csv.CSV)
+representation.register('application/x-msgpack', _msgpack.MessagePack)
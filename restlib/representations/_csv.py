@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+
+import csv
+
+from restlib.representations._json import JSON, get_type_encoder
+
+class _Buffer(object):
+    "A file-like object for ``csv.writer`` which collects the lines written."
+    def __init__(self):
+        self.lines = []
+        self.write = self.lines.append
+
+
+class CSV(object):
+    """Comma separated values with a header row followed by one line per
+    record. The columns are the ``columns`` passed when encoding, e.g. the
+    fields of the resource, or the sorted keys of the first record otherwise.
+
+    Values are encoded as UTF-8. Dates and other types are formatted as they
+    are for JSON, while nested objects and lists are encoded as JSON.
+    """
+    # the minimum size in bytes of the chunks yielded by ``encode_iter``
+    chunk_size = 8192
+
+    def __init__(self):
+        self.json = JSON()
+
+    def _get_cell(self, value, encoder):
+        if value is None:
+            return ''
+
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+
+        if isinstance(value, (str, int, long, float, bool)):
+            return value
+
+        if isinstance(value, (dict, list, tuple)):
+            return encoder.encode(value)
+
+        func = get_type_encoder(value.__class__)
+        if func is not None:
+            return self._get_cell(func(value), encoder)
+        return value
+
+    def encode(self, data, columns=None, **kwargs):
+        return ''.join(self.encode_iter(data, columns=columns))
+
+    def encode_iter(self, data, columns=None, **kwargs):
+        # a single object is a single record, while anything else that is not
+        # a sequence of records, e.g. an error message, is a single cell
+        if isinstance(data, dict) or not hasattr(data, '__iter__'):
+            data = [data]
+
+        encoder = self.json.get_encoder({})
+        buffer = _Buffer()
+        writer = csv.writer(buffer)
+        header, size = False, 0
+
+        for item in data:
+            if not isinstance(item, dict):
+                writer.writerow([self._get_cell(item, encoder)])
+                size += len(buffer.lines[-1])
+                continue
+
+            if not header:
+                if columns is None:
+                    columns = sorted(item.keys())
+                writer.writerow(columns)
+                header = True
+
+            writer.writerow([self._get_cell(item.get(x), encoder)
+                for x in columns])
+            size += len(buffer.lines[-1])
+
+            if size >= self.chunk_size:
+                yield ''.join(buffer.lines)
+                del buffer.lines[:]
+                size = 0
+
+        # only the header is written if there are no records
+        if not header and not buffer.lines and columns is not None:
+            writer.writerow(columns)
+
+        if buffer.lines:
+            yield ''.join(buffer.lines)
@@ -1,34 +1,116 @@
 from datetime import datetime, date, time
 from decimal import Decimal
-from django.utils import simplejson
+from inspect import getargspec
+
 from django.conf import settings
+from django.core import exceptions
+from django.utils.importlib import import_module
+
+from restlib.conf import settings as restlib_settings
 
 DATE_FORMAT = '%m/%d/%Y'
 TIME_FORMAT = '%H:%M:%S'
 
-class JSONEncoder(simplejson.JSONEncoder):
-    "Enhances the default JSONEncoder to handle other Python types."
-    def default(self, obj):
+# the JSON libraries which may be used as the backend in order of preference.
+# these all produce the same output given the same options
+BACKENDS = ('simplejson', 'json', 'django.utils.simplejson')
+
+def _has_speedups(module):
+    encoder = getattr(module, 'encoder', None)
+    return getattr(encoder, 'c_make_encoder', None) is not None
+
+def load_backend(name=None):
+    """Returns the JSON library module ``name`` or, if not given, the first
+    library in ``BACKENDS`` which has C speedups with a fallback to the first
+    library available.
+    """
+    if name is not None:
+        try:
+            return import_module(name)
+        except ImportError, e:
+            raise exceptions.ImproperlyConfigured('Error importing JSON '
+                'backend %s: "%s"' % (name, e))
+
+    available = []
+
+    for name in BACKENDS:
+        try:
+            module = import_module(name)
+        except ImportError:
+            continue
+
+        if _has_speedups(module):
+            return module
+        available.append(module)
+
+    return available[0]
+
+
+def _encode_date(obj):
+    return '%02d/%02d/%04d' % (obj.month, obj.day, obj.year)
+
+def _encode_time(obj):
+    return '%02d:%02d:%02d' % (obj.hour, obj.minute, obj.second)
+
+def _encode_datetime(obj):
+    return '%02d/%02d/%04d %02d:%02d:%02d' % (obj.month, obj.day, obj.year,
+        obj.hour, obj.minute, obj.second)
+
+# the functions converting objects of types not supported by JSON into ones
+# that are, keyed by the type. use ``register_type`` to add other types. the
+# date and time formats are equivalent to ``DATE_FORMAT`` and ``TIME_FORMAT``
+type_encoders = {
+    set: list,
+    frozenset: list,
+    Decimal: float,
+    datetime: _encode_datetime,
+    date: _encode_date,
+    time: _encode_time,
+}
+
+# the function for each type encountered, including subclasses of registered
+# types which are resolved using the MRO
+_type_encoder_cache = {}
+
+def register_type(klass, func):
+    """Registers the function ``func`` which converts objects of type
+    ``klass``, or a subclass, into an object that can be encoded, e.g.
+    ``register_type(UUID, str)``.
+    """
+    type_encoders[klass] = func
+    _type_encoder_cache.clear()
+
+def get_type_encoder(klass):
+    "Returns the function registered for ``klass`` or any of its bases."
+    try:
+        return _type_encoder_cache[klass]
+    except KeyError:
+        pass
 
-        if isinstance(obj, set):
-            return list(set)
+    func = None
+    for base in getattr(klass, '__mro__', (klass,)):
+        if base in type_encoders:
+            func = type_encoders[base]
+            break
 
-        if isinstance(obj, Decimal):
-            return float(str(obj))
+    _type_encoder_cache[klass] = func
+    return func
 
-        if isinstance(obj, datetime):
-            return obj.strftime('%s %s' % (DATE_FORMAT, TIME_FORMAT))
 
-        if isinstance(obj, date):
-            return obj.strftime(DATE_FORMAT)
+class JSONEncoderMixin(object):
+    """Enhances the default JSONEncoder to handle other Python types. See
+    ``register_type``.
+    """
+    def default(self, obj):
+        func = get_type_encoder(obj.__class__)
 
-        if isinstance(obj, time):
-            return obj.strftime(TIME_FORMAT)
+        if func is not None:
+            return func(obj)
 
-        return super(JSONEncoder, self).default(obj)
+        return super(JSONEncoderMixin, self).default(obj)
 
 
-class JSONDecoder(simplejson.JSONDecoder):
+class JSONDecoderMixin(object):
     "Enhances the default JSONDecoder to handles other Python types."
     # TODO determine if date and times are worth supporting. my initial
     # gut is no since it is unknown whether the data is going to be handled
@@ -37,34 +119,119 @@ class JSONDecoder(simplejson.JSONDecoder):
     # *every* string would have to be tested to see if it matches a datetime
     # format.
     def default(self, obj):
-        return super(JSONDecoder, self).default(obj)
+        return super(JSONDecoderMixin, self).default(obj)
+
+
+def get_encoder_class(backend):
+    return type('JSONEncoder', (JSONEncoderMixin, backend.JSONEncoder), {})
+
+def get_decoder_class(backend):
+    return type('JSONDecoder', (JSONDecoderMixin, backend.JSONDecoder), {})
+
+def get_backend_options(backend):
+    """Returns the options required for ``backend`` to produce the same output
+    as the other backends.
+    """
+    # newer versions of simplejson encode decimals natively, which differs
+    # from the formatting of ``JSONEncoderMixin``
+    if 'use_decimal' in getargspec(backend.JSONEncoder.__init__)[0]:
+        return {'use_decimal': False}
+    return {}
+
+
+# the backend is determined once, the ``JSON_BACKEND`` setting may be used to
+# force a specific library
+backend = load_backend(restlib_settings.JSON_BACKEND)
+
+JSONEncoder = get_encoder_class(backend)
+JSONDecoder = get_decoder_class(backend)
 
 
 class JSON(object):
     """Very basic JSON representation encode/decoder. Additional Python types
     are supported via a encoder subclass including: set, Decimal, datetime,
     date and time objects.
+
+    The encoder and decoder are created once for each set of options, rather
+    than per call, since they are not modified when used.
     """
     encode_options = {}
     decode_options = {}
 
+    # the minimum size in bytes of the chunks yielded by ``encode_iter``
+    chunk_size = 8192
+
     if settings.DEBUG:
         encode_options = {
             'indent': 4,
             'sort_keys': True,
         }
 
-    def encode(self, data, options=None, **kwargs):
+    encoder_class = JSONEncoder
+    decoder_class = JSONDecoder
+    backend_options = get_backend_options(backend)
+
+    def __init__(self):
+        self._encoders = {}
+        self._decoders = {}
+
+    def get_encoder(self, options=None):
         if options is None:
             options = self.encode_options
 
-        encoder = JSONEncoder(**options)
-        return encoder.encode(data)
+        key = tuple(sorted(options.items()))
 
-    def decode(self, data, options=None, **kwargs):
+        try:
+            return self._encoders[key]
+        except KeyError:
+            pass
+
+        kwargs = dict(self.backend_options)
+        kwargs.update(options)
+        encoder = self._encoders[key] = self.encoder_class(**kwargs)
+        return encoder
+
+    def get_decoder(self, options=None):
         if options is None:
             options = self.decode_options
 
-        decoder = JSONDecoder(**options)
-        return decoder.decode(data)
+        key = tuple(sorted(options.items()))
+
+        try:
+            return self._decoders[key]
+        except KeyError:
+            pass
+
+        decoder = self._decoders[key] = self.decoder_class(**options)
+        return decoder
 
+    def encode(self, data, options=None, **kwargs):
+        return self.get_encoder(options).encode(data)
+
+    def encode_iter(self, data, options=None, **kwargs):
+        """Incrementally encodes the iterable ``data`` as a JSON array. Each
+        item is encoded as it is consumed and the output is yielded in chunks
+        of at least ``chunk_size`` bytes.
+        """
+        encoder = self.get_encoder(options)
+        separator = encoder.item_separator
+
+        chunk, size = ['['], 1
+
+        for i, item in enumerate(data):
+            if i:
+                chunk.append(separator)
+
+            text = encoder.encode(item)
+            chunk.append(text)
+            size += len(text)
+
+            if size >= self.chunk_size:
+                yield ''.join(chunk)
+                chunk, size = [], 0
+
+        chunk.append(']')
+        yield ''.join(chunk)
+
+    def decode(self, data, options=None, **kwargs):
+        return self.get_decoder(options).decode(data)
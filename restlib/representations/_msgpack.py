@@ -0,0 +1,295 @@
+import struct
+
+from restlib.representations._json import get_type_encoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _default(obj):
+    # the same types are supported as for JSON, see ``register_json_type``
+    func = get_type_encoder(obj.__class__)
+
+    if func is None:
+        raise TypeError('%r is not MessagePack serializable' % obj)
+
+    return func(obj)
+
+
+_uint8 = struct.Struct('>B')
+_uint16 = struct.Struct('>H')
+_uint32 = struct.Struct('>I')
+_uint64 = struct.Struct('>Q')
+_int8 = struct.Struct('>b')
+_int16 = struct.Struct('>h')
+_int32 = struct.Struct('>i')
+_int64 = struct.Struct('>q')
+_float32 = struct.Struct('>f')
+_float64 = struct.Struct('>d')
+
+
+class Packer(object):
+    """A pure-Python MessagePack encoder used if the ``msgpack`` library is
+    not installed. Both ``str`` and ``unicode`` are packed using the (UTF-8)
+    str format and objects of any other type are converted by ``default``.
+    """
+    def __init__(self, default=None):
+        self.default = default
+        self._packers = {
+            type(None): self._pack_nil,
+            bool: self._pack_bool,
+            int: self._pack_int,
+            long: self._pack_int,
+            float: self._pack_float,
+            str: self._pack_str,
+            unicode: self._pack_unicode,
+            list: self._pack_array,
+            tuple: self._pack_array,
+            dict: self._pack_map,
+        }
+
+    def _get_packer(self, klass):
+        # subclasses, e.g. ``SafeUnicode``, are packed as their base type
+        for base in getattr(klass, '__mro__', ()):
+            if base in self._packers:
+                func = self._packers[klass] = self._packers[base]
+                return func
+
+    def _pack(self, obj, write):
+        func = self._packers.get(obj.__class__)
+
+        if func is None:
+            func = self._get_packer(obj.__class__)
+
+        if func is not None:
+            return func(obj, write)
+
+        if self.default is not None:
+            value = self.default(obj)
+            func = self._get_packer(value.__class__)
+            if func is not None:
+                return func(value, write)
+
+        raise TypeError('%r is not MessagePack serializable' % obj)
+
+    def _pack_nil(self, obj, write):
+        write('\xc0')
+
+    def _pack_bool(self, obj, write):
+        write(obj and '\xc3' or '\xc2')
+
+    def _pack_int(self, obj, write):
+        if obj >= 0:
+            if obj < 0x80:
+                write(_uint8.pack(obj))
+            elif obj <= 0xff:
+                write('\xcc' + _uint8.pack(obj))
+            elif obj <= 0xffff:
+                write('\xcd' + _uint16.pack(obj))
+            elif obj <= 0xffffffff:
+                write('\xce' + _uint32.pack(obj))
+            elif obj <= 0xffffffffffffffff:
+                write('\xcf' + _uint64.pack(obj))
+            else:
+                raise OverflowError('Integer out of range')
+        else:
+            if obj >= -0x20:
+                write(_int8.pack(obj))
+            elif obj >= -0x80:
+                write('\xd0' + _int8.pack(obj))
+            elif obj >= -0x8000:
+                write('\xd1' + _int16.pack(obj))
+            elif obj >= -0x80000000:
+                write('\xd2' + _int32.pack(obj))
+            elif obj >= -0x8000000000000000:
+                write('\xd3' + _int64.pack(obj))
+            else:
+                raise OverflowError('Integer out of range')
+
+    def _pack_float(self, obj, write):
+        write('\xcb' + _float64.pack(obj))
+
+    def _pack_str(self, obj, write):
+        n = len(obj)
+
+        # str 8 is not used, so the output is compatible with decoders of the
+        # older version of the format, as with ``use_bin_type=False``
+        if n < 0x20:
+            write(_uint8.pack(0xa0 | n))
+        elif n <= 0xffff:
+            write('\xda' + _uint16.pack(n))
+        else:
+            write('\xdb' + _uint32.pack(n))
+        write(obj)
+
+    def _pack_unicode(self, obj, write):
+        self._pack_str(obj.encode('utf-8'), write)
+
+    def _pack_array(self, obj, write):
+        n = len(obj)
+
+        if n < 0x10:
+            write(_uint8.pack(0x90 | n))
+        elif n <= 0xffff:
+            write('\xdc' + _uint16.pack(n))
+        else:
+            write('\xdd' + _uint32.pack(n))
+
+        pack = self._pack
+        for item in obj:
+            pack(item, write)
+
+    def _pack_map(self, obj, write):
+        n = len(obj)
+
+        if n < 0x10:
+            write(_uint8.pack(0x80 | n))
+        elif n <= 0xffff:
+            write('\xde' + _uint16.pack(n))
+        else:
+            write('\xdf' + _uint32.pack(n))
+
+        pack = self._pack
+        for key, value in obj.iteritems():
+            pack(key, write)
+            pack(value, write)
+
+    def pack(self, obj):
+        chunks = []
+        self._pack(obj, chunks.append)
+        return ''.join(chunks)
+
+
+def _read(data, pos, n):
+    end = pos + n
+    if end > len(data):
+        raise ValueError('Unexpected end of data')
+    return data[pos:end], end
+
+def _unpack_struct(data, pos, fmt):
+    value, pos = _read(data, pos, fmt.size)
+    return fmt.unpack(value)[0], pos
+
+def _unpack_array(data, pos, n):
+    items = []
+    append = items.append
+
+    for i in xrange(n):
+        item, pos = _unpack(data, pos)
+        append(item)
+
+    return items, pos
+
+def _unpack_map(data, pos, n):
+    obj = {}
+
+    for i in xrange(n):
+        key, pos = _unpack(data, pos)
+        obj[key], pos = _unpack(data, pos)
+
+    return obj, pos
+
+# the struct of the length or value following each (non-fixed) type byte
+_sized = {
+    0xc4: (_uint8, 'bin'), 0xc5: (_uint16, 'bin'), 0xc6: (_uint32, 'bin'),
+    0xca: (_float32, None), 0xcb: (_float64, None),
+    0xcc: (_uint8, None), 0xcd: (_uint16, None),
+    0xce: (_uint32, None), 0xcf: (_uint64, None),
+    0xd0: (_int8, None), 0xd1: (_int16, None),
+    0xd2: (_int32, None), 0xd3: (_int64, None),
+    0xd9: (_uint8, 'str'), 0xda: (_uint16, 'str'), 0xdb: (_uint32, 'str'),
+    0xdc: (_uint16, 'array'), 0xdd: (_uint32, 'array'),
+    0xde: (_uint16, 'map'), 0xdf: (_uint32, 'map'),
+}
+
+def _unpack(data, pos):
+    if pos >= len(data):
+        raise ValueError('Unexpected end of data')
+
+    b = ord(data[pos])
+    pos += 1
+
+    if b < 0x80:
+        return b, pos
+    if b >= 0xe0:
+        return b - 0x100, pos
+    if 0xa0 <= b <= 0xbf:
+        value, pos = _read(data, pos, b & 0x1f)
+        return value.decode('utf-8'), pos
+    if b <= 0x8f:
+        return _unpack_map(data, pos, b & 0x0f)
+    if b <= 0x9f:
+        return _unpack_array(data, pos, b & 0x0f)
+    if b == 0xc0:
+        return None, pos
+    if b == 0xc2:
+        return False, pos
+    if b == 0xc3:
+        return True, pos
+
+    if b not in _sized:
+        raise ValueError('Unsupported MessagePack type 0x%x' % b)
+
+    fmt, kind = _sized[b]
+    value, pos = _unpack_struct(data, pos, fmt)
+
+    if kind is None:
+        return value, pos
+    if kind == 'array':
+        return _unpack_array(data, pos, value)
+    if kind == 'map':
+        return _unpack_map(data, pos, value)
+
+    value, pos = _read(data, pos, value)
+    if kind == 'str':
+        value = value.decode('utf-8')
+    return value, pos
+
+def unpackb(data):
+    "Decodes the MessagePack encoded ``data``. Strings are decoded as unicode."
+    obj, pos = _unpack(data, 0)
+    if pos != len(data):
+        raise ValueError('Extra data after the MessagePack object')
+    return obj
+
+
+# the library used to encode and decode
+if msgpack is not None:
+    backend = 'msgpack'
+
+    # the options differ between versions of the ``msgpack`` library
+    if getattr(msgpack, 'version', ()) >= (0, 5, 2):
+        _pack_options = {'use_bin_type': False}
+        _unpack_options = {'raw': False}
+    else:
+        _pack_options = {}
+        _unpack_options = {'encoding': 'utf-8'}
+
+    def _encode(data):
+        return msgpack.packb(data, default=_default, **_pack_options)
+
+    def _decode(data):
+        return msgpack.unpackb(data, **_unpack_options)
+else:
+    backend = 'restlib'
+
+    _encode = Packer(default=_default).pack
+    _decode = unpackb
+
+
+class MessagePack(object):
+    """A compact binary representation, see http://msgpack.org. The C
+    extension of the ``msgpack`` library is used if installed, otherwise a
+    pure-Python implementation.
+
+    The same additional Python types are supported as for JSON and they are
+    converted the same way, e.g. dates are formatted as strings. Strings are
+    decoded as unicode.
+    """
+    def encode(self, data, **kwargs):
+        return _encode(data)
+
+    def decode(self, data, **kwargs):
+        return _decode(data)
@@ -0,0 +1,41 @@
+from restlib.representations._json import JSON
+
+class NDJSON(object):
+    """Newline delimited JSON, i.e. one JSON encoded record per line. Since
+    each record is encoded separately, this is suited for streaming large
+    collections. The records are never indented.
+    """
+    # the minimum size in bytes of the chunks yielded by ``encode_iter``
+    chunk_size = 8192
+
+    def __init__(self):
+        self.json = JSON()
+
+    def encode(self, data, **kwargs):
+        return ''.join(self.encode_iter(data, **kwargs))
+
+    def encode_iter(self, data, **kwargs):
+        # a single object is a single record, as is anything else that is not
+        # a sequence of records, e.g. an error message
+        if isinstance(data, dict) or not hasattr(data, '__iter__'):
+            data = [data]
+
+        encoder = self.json.get_encoder({})
+        chunk, size = [], 0
+
+        for item in data:
+            text = encoder.encode(item)
+            chunk.append(text)
+            chunk.append('\n')
+            size += len(text) + 1
+
+            if size >= self.chunk_size:
+                yield ''.join(chunk)
+                chunk, size = [], 0
+
+        if chunk:
+            yield ''.join(chunk)
+
+    def decode(self, data, **kwargs):
+        decoder = self.json.get_decoder({})
+        return [decoder.decode(line) for line in data.splitlines() if line.strip()]
@@ -1,5 +1,99 @@
+from itertools import chain
+from cStringIO import StringIO
 from xml.etree import cElementTree as ET
 
+def _escape(value):
+    "Returns the escaped UTF-8 encoded text of a primitive value."
+    if isinstance(value, unicode):
+        text = value.encode('utf-8')
+    else:
+        text = str(value)
+
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+def _get_tag(key):
+    if isinstance(key, unicode):
+        return key.encode('utf-8')
+    return key
+
+def _get_text(data):
+    """Returns the text of the element for ``data``. Primitive values within
+    lists are all set as the text of the same element, so the last one wins.
+    """
+    if isinstance(data, dict):
+        return None
+
+    if isinstance(data, (list, tuple)):
+        for x in reversed(data):
+            text = _get_text(x)
+            if text is not None:
+                return text
+        return None
+
+    return _escape(data)
+
+def _has_children(data):
+    if isinstance(data, dict):
+        return bool(data)
+
+    if isinstance(data, (list, tuple)):
+        for x in data:
+            if _has_children(x):
+                return True
+
+    return False
+
+
+def _compile_converters(converters):
+    """Compiles the ``converters`` keyed by the paths of elements below the
+    root, e.g. ``book/pub_date``, into a trie of ``[children, converter]``
+    nodes keyed by tag. The root of the trie represents the root element.
+    """
+    trie = [{}, None]
+
+    for path, converter in converters.iteritems():
+        node = trie
+
+        if path:
+            for tag in path.split('/'):
+                node = node[0].setdefault(tag, [{}, None])
+
+        node[1] = converter
+
+    return trie
+
+
+def _convert(node, trie, leaves):
+    """Applies the converters of the ``trie`` to the text of the leaves of the
+    decoded ``node``. Only the paths which have converters are visited.
+    """
+    children, converter = trie
+
+    if type(node) is list:
+        return [_convert(x, trie, leaves) for x in node]
+
+    if isinstance(node, dict):
+        if id(node) in leaves:
+            if converter is not None and node['text'] is not None:
+                node['text'] = converter(node['text'])
+            return node
+
+        for tag, subtrie in children.iteritems():
+            if tag in node:
+                node[tag] = _convert(node[tag], subtrie, leaves)
+        return node
+
+    if converter is not None and node is not None:
+        return converter(node)
+    return node
+
+
 class DataOrientedXML(object):
     """A data oriented XML encoder/decoder.
 
@@ -64,6 +158,38 @@ class DataOrientedXML(object):
 
         return node
 
+    # the minimum size in bytes of the chunks yielded by ``encode_iter``
+    chunk_size = 8192
+
+    # the limits of the XML accepted by ``decode``. ``max_size`` may be
+    # ``None`` for no limit
+    max_depth = 64
+    max_size = 10 * 1024 * 1024
+
+    def _write_element(self, tag, data, write):
+        text = _get_text(data)
+
+        if not text and not _has_children(data):
+            write('<%s />' % tag)
+            return
+
+        write('<%s>' % tag)
+        if text:
+            write(text)
+        self._write_children(data, write)
+        write('</%s>' % tag)
+
+    def _write_children(self, data, write):
+        # each key becomes a new element, lists of items are written to
+        # the same parent element
+        if isinstance(data, dict):
+            for k, v in data.iteritems():
+                self._write_element(_get_tag(k), v, write)
+
+        elif isinstance(data, (list, tuple)):
+            for x in data:
+                self._write_children(x, write)
+
     def _encode(self, data, parent):
 
         # each key becomes a new node, recurse the the value
@@ -86,12 +212,139 @@ class DataOrientedXML(object):
         return parent
 
     def decode(self, text, converters=None, **kwargs):
-        if not converters:
-            converters = {}
-        root = ET.XML(text)
-        return self._decode(root, converters)
+        """Decodes ``text`` incrementally using ``iterparse``. Each element is
+        converted once it has been parsed and the subelements are discarded,
+        so the complete tree is never held in memory. The output is the same
+        as ``_decode`` applied to the complete tree.
+
+        A ``ValueError`` is raised if the ``text`` is longer than ``max_size``
+        bytes or elements are nested deeper than ``max_depth``.
+        """
+        if self.max_size is not None and len(text) > self.max_size:
+            raise ValueError('XML exceeds the maximum size of %d bytes' % self.max_size)
+
+        node, leaves = self._iterparse(text)
+
+        if converters:
+            node = _convert(node, _compile_converters(converters), leaves)
+
+        return node
+
+    def _iterparse(self, text):
+        max_depth = self.max_depth
+        depth = 0
+
+        # the tag and converted node of the elements which have been parsed,
+        # but not their parents. since elements end in post-order, the
+        # subelements of an element are the last items
+        stack = []
+        # the leaves with attributes, so their text can be distinguished from
+        # a subelement named 'text' when applying the converters
+        leaves = set()
+
+        for event, elem in ET.iterparse(StringIO(text), ('start', 'end')):
+            # the depth is checked as elements are entered, so nothing below
+            # the maximum depth is parsed
+            if event == 'start':
+                depth += 1
+                if depth > max_depth:
+                    raise ValueError('XML exceeds the maximum depth of %d' % max_depth)
+                continue
+
+            depth -= 1
+            count = len(elem)
+
+            if count:
+                node = {}
+
+                for tag, subnode in stack[-count:]:
+                    # multiple elements with the same tag turn into a list
+                    if tag in node:
+                        if type(node[tag]) is not list:
+                            node[tag] = [node[tag]]
+                        node[tag].append(subnode)
+                    else:
+                        node[tag] = subnode
+
+                del stack[-count:]
+                elem.clear()
+
+            # no subelements exist, so treat it as a set of attributes or the
+            # text value if no element attributes are defined
+            else:
+                node = elem.text
+
+                if not node or not node.strip():
+                    node = None
+
+                if elem.attrib:
+                    node = dict(elem.attrib, text=node)
+                    leaves.add(id(node))
+
+            stack.append((elem.tag, node))
+
+        return stack[-1][1], leaves
 
     def encode(self, data, root_tag='root', **kwargs):
-        root = ET.Element(root_tag)
-        return ET.tostring(self._encode(data, root), 'utf-8')
+        """Writes the XML for ``data`` directly, rather than building an
+        ``ElementTree``. The output is the same as serializing the tree built
+        by ``_encode``, except that unicode values are supported.
+        """
+        output = []
+        self._write_element(root_tag, data, output.append)
+        return ''.join(output)
+
+    def encode_iter(self, data, root_tag='root', **kwargs):
+        """Incrementally encodes the iterable ``data`` of objects, e.g. a
+        stream of resolved model objects. Each item is written as it is
+        consumed and the output is yielded in chunks of at least
+        ``chunk_size`` bytes.
+
+        Primitive items set the text of the root, which precedes any children,
+        so ``data`` is encoded using ``encode`` if these occur before the first
+        chunk has been yielded. A ``ValueError`` is raised if they occur after.
+        """
+        data = iter(data)
+
+        # the root element is empty if there are no items with children
+        for first in data:
+            if isinstance(first, dict):
+                if first:
+                    break
+                continue
+
+            yield self.encode([first] + list(data), root_tag)
+            return
+        else:
+            yield self.encode([], root_tag)
+            return
+
+        chunk, size = ['<%s>' % root_tag], 0
+        # the items encoded so far, until the first chunk has been yielded
+        items = []
+
+        for item in chain([first], data):
+            if _get_text(item) is not None:
+                if items is None:
+                    raise ValueError('Primitive items cannot be encoded after '
+                        'items with children have been streamed')
+
+                yield self.encode(items + [item] + list(data), root_tag)
+                return
+
+            output = []
+            self._write_children(item, output.append)
+
+            text = ''.join(output)
+            chunk.append(text)
+            size += len(text)
+
+            if items is not None:
+                items.append(item)
+
+            if size >= self.chunk_size:
+                yield ''.join(chunk)
+                chunk, size, items = [], 0, None
 
+        chunk.append('</%s>' % root_tag)
+        yield ''.join(chunk)
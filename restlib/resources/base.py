@@ -1,14 +1,19 @@
+import time
 import inspect
+import threading
 
+from django.conf import settings as django_settings
 from django.template import Context
 from django.http import HttpRequest, HttpResponse
 from django.core import exceptions
 from django.template.loader import get_template
-from django.utils.importlib import import_module
 
 from restlib import http
 from restlib.conf import settings
+from restlib.utils import import_class
 from restlib.resources import utils
+from restlib.resources.timing import (TOTAL, HANDLER, RESOLVE, ENCODE,
+    get_sink, format_server_timing)
 from restlib.representations import representation
 
 __all__ = ('Resource', 'ResourceCollection')
@@ -28,8 +33,13 @@ def build_docstring(cls):
 
 def HEAD(self, request, *args, **kwargs):
     output = self.GET(request, *args, **kwargs)
-    response = self._get_response(request, output)
+
+    # the entity-body is never sent, so it is not resolved nor encoded
+    response = self._get_response(request, output, encode=False)
     response.content = ''
+
+    for key, value in self.get_head_headers(request, output).iteritems():
+        response[key] = value
     return response
 
 def OPTIONS(self, request, *args, **kwargs):
@@ -50,22 +60,7 @@ def _setup_middleware(mcls, resource):
             if inspect.isclass(middleware_path):
                 mw_instance = middleware_path()
             else:
-                try:
-                    dot = middleware_path.rindex('.')
-                except ValueError:
-                    raise exceptions.ImproperlyConfigured('%s isn\'t a middleware module' % middleware_path)
-
-                mw_module, mw_classname = middleware_path[:dot], middleware_path[dot+1:]
-
-                try:
-                    mod = import_module(mw_module)
-                except ImportError, e:
-                    raise exceptions.ImproperlyConfigured('Error importing middleware %s: "%s"' % (mw_module, e))
-
-                try:
-                    mw_class = getattr(mod, mw_classname)
-                except AttributeError:
-                    raise exceptions.ImproperlyConfigured('Middleware module "%s" does not define a "%s" class' % (mw_module, mw_classname))
+                mw_class = import_class(middleware_path, 'middleware')
 
                 try:
                     mcls._middleware[middleware_path] = mw_instance = mw_class()
@@ -95,7 +90,179 @@ def _setup_middleware(mcls, resource):
                 procs.setdefault('process_response', [])
                 procs['process_response'].append(mw_instance.process_response)
 
-        resource._middleware = processors
+    resource._middleware = processors
+
+    # the complete chain of each method is compiled once, so dispatching a
+    # request involves no lookups of the middleware. the timed chain is only
+    # used if enabled, so timing costs nothing otherwise
+    if resource.timing:
+        compile_dispatch = _compile_timed_dispatch
+    else:
+        compile_dispatch = _compile_dispatch
+
+    resource._dispatch = dict((method, compile_dispatch(procs))
+        for method, procs in processors.iteritems())
+
+
+def _get_output_handler(mw_instance):
+    """Returns a function which converts the (non-None) output of a processor
+    of ``mw_instance`` into a response. Whether the middleware defines
+    ``get_response`` and its ``status_code`` are determined up front.
+    """
+    if hasattr(mw_instance, 'get_response'):
+        get_response = mw_instance.get_response
+
+        def handler(resource, request, output):
+            if isinstance(output, HttpResponse):
+                return output
+
+            # custom method that may exist on the middleware class
+            # for generating an HttpResponse object
+            return get_response(message=output, resource=resource,
+                request=request)
+
+        return handler
+
+    # the error of a missing status code is deferred until it is required
+    if hasattr(mw_instance, 'status_code'):
+        status = http.responses[mw_instance.status_code]
+    else:
+        status = None
+
+    def handler(resource, request, output):
+        if isinstance(output, HttpResponse):
+            return output
+
+        if not isinstance(output, http.HttpStatusCode):
+            if status is None:
+                output = (http.responses[mw_instance.status_code], output)
+            else:
+                output = (status, output)
+
+        return resource._get_response(request, output)
+
+    return handler
+
+
+def _compile_dispatch(procs, wrap=None, call=None):
+    """Returns a function which processes a request by calling the request
+    processors in ``procs``, then the resource method and finally the
+    response processors. If at any point a processor returns a message that
+    is not None, the response for that message is returned.
+
+    ``wrap`` may be given to wrap each processor and is passed the processor
+    and its phase, i.e. ``request`` or ``response``. ``call`` may be given to
+    call the resource method in place of calling it directly.
+    """
+    if wrap is None:
+        wrap = lambda proc, phase: proc
+
+    request_procs = tuple([(wrap(proc, 'request'),
+        _get_output_handler(proc.__self__))
+        for proc in procs.get('process_request', ())])
+    response_procs = tuple([(wrap(proc, 'response'),
+        _get_output_handler(proc.__self__))
+        for proc in procs.get('process_response', ())])
+
+    def dispatch(resource, request, args, kwargs):
+        for proc, handler in request_procs:
+            try:
+                output = proc(resource=resource, request=request)
+            except http.HttpStatusCode, e:
+                output = e
+
+            if output is not None:
+                return handler(resource, request, output)
+
+        try:
+            # call the requested resource method
+            if call is None:
+                output = getattr(resource, request.method)(request, *args, **kwargs)
+            else:
+                output = call(resource, request, args, kwargs)
+        except http.HttpStatusCode, e:
+            output = e
+
+        # get the response based on the Resource method's output
+        response = resource._get_response(request, output)
+
+        for proc, handler in response_procs:
+            try:
+                output = proc(resource=resource, request=request,
+                    response=response)
+            except http.HttpStatusCode, e:
+                output = e
+
+            if output is not None:
+                return handler(resource, request, output)
+
+        return response
+
+    return dispatch
+
+
+class _TimedProcessor(object):
+    """Wraps a middleware processor and records its duration in the timings
+    of the request.
+    """
+    def __init__(self, proc, phase):
+        self.proc = proc
+        self.__self__ = proc.__self__
+        self.name = '%s.%s' % (phase, proc.__self__.__class__.__name__)
+
+    def __call__(self, request, **kwargs):
+        start = time.time()
+        try:
+            return self.proc(request=request, **kwargs)
+        finally:
+            request.resource_timings.append((self.name, time.time() - start))
+
+
+def _call_timed(resource, request, args, kwargs):
+    start = time.time()
+    try:
+        return getattr(resource, request.method)(request, *args, **kwargs)
+    finally:
+        request.resource_timings.append((HANDLER, time.time() - start))
+
+
+def _compile_timed_dispatch(procs):
+    """Returns a function equivalent to that of ``_compile_dispatch`` which
+    also times each processor, the resource method and the resolving and
+    encoding of the content. The timings are recorded to the sink and, if
+    enabled for the resource, set in the ``Server-Timing`` header.
+
+    Streamed content is resolved and encoded as the response is written, so
+    only the setup of the stream is timed.
+    """
+    process = _compile_dispatch(procs, wrap=_TimedProcessor, call=_call_timed)
+
+    def dispatch(resource, request, args, kwargs):
+        request.resource_timings = timings = []
+
+        start = time.time()
+        response = process(resource, request, args, kwargs)
+        timings.append((TOTAL, time.time() - start))
+
+        get_sink().record(resource.__class__, request.method, timings,
+            response)
+
+        if resource.server_timing:
+            response['Server-Timing'] = format_server_timing(timings)
+
+        return response
+
+    return dispatch
+
+
+def _stateless_setattr(self, name, value):
+    # the instance is shared by all requests, so any state set while handling
+    # a request leaks into others. see ``Resource.stateless``
+    if self.__dict__.get('_shared'):
+        raise AttributeError('Cannot set "%s" on the stateless resource %s. '
+            'State must be kept on the request since the instance handles all '
+            'requests' % (name, self.__class__.__name__))
+    object.__setattr__(self, name, value)
 
 
 class ResourceMetaclass(type):
@@ -104,6 +271,7 @@ class ResourceMetaclass(type):
     """
     _cache = {}
     _middleware = {}
+    _lock = threading.Lock()
 
     def __new__(cls, name, bases, attrs):
         # create the new class so all inherited attributes have been set.
@@ -150,6 +318,11 @@ class ResourceMetaclass(type):
 
             _setup_middleware(cls, new_cls)
 
+            # in debug mode, the shared instance of a stateless resource
+            # refuses any attribute assignment once it has been created
+            if new_cls.stateless and django_settings.DEBUG:
+                new_cls.__setattr__ = _stateless_setattr
+
             # the docstring rendering comes after populating all other
             # attributes since it depends on the complete set of attributes
             # that class expects to be set. note, the __doc__ is intentionally
@@ -169,10 +342,30 @@ class ResourceMetaclass(type):
         an instance, and calls it with the arguments.
         """
         if args and isinstance(args[0], HttpRequest):
-            instance = super(ResourceMetaclass, cls).__call__()
+            if cls.stateless:
+                instance = cls._get_shared_instance()
+            else:
+                instance = super(ResourceMetaclass, cls).__call__()
             return instance.__call__(*args, **kwargs)
         return super(ResourceMetaclass, cls).__call__(*args, **kwargs)
 
+    def _get_shared_instance(cls):
+        "Returns the instance of a stateless resource, creating it once."
+        # the class dict is checked so subclasses do not share the instance
+        # of their parent
+        instance = cls.__dict__.get('_shared_instance')
+
+        if instance is None:
+            with ResourceMetaclass._lock:
+                instance = cls.__dict__.get('_shared_instance')
+
+                if instance is None:
+                    instance = super(ResourceMetaclass, cls).__call__()
+                    object.__setattr__(instance, '_shared', True)
+                    cls._shared_instance = instance
+
+        return instance
+
 
 class Resource(object):
     """The base Resource class which provides a simple interface for defining
@@ -185,108 +378,46 @@ class Resource(object):
     ``mimetypes`` - a list of acceptable mimetypes that can be accepted
     and/or responded with. the precedence of a mimetype is defined by the
     position in the list with the 0th position having the highest precedence.
-    """
-
-    __metaclass__ = ResourceMetaclass
-
-    mimetypes = ('application/json',)
 
-    middleware = settings.RESOURCE_MIDDLEWARE
-
-    def __call__(self, request, *args, **kwargs):
-        method = request.method
-
-        _response = self._process_request_middleware(request)
-        if _response is not None:
-            return _response
-
-        try:
-            # call the requested resource method
-            output = getattr(self, method)(request, *args, **kwargs)
-        except http.HttpStatusCode, e:
-            output = e
-
-        # get the response based on the Resource method's output
-        response = self._get_response(request, output)
-
-        _response = self._process_response_middleware(request, response)
-        if _response is not None:
-            return _response
-
-        return response
+    ``timing`` - if true, the duration of each middleware processor, the
+    resource method and the resolving and encoding of the content is recorded
+    for each request. See ``restlib.resources.timing``.
 
-    def _process_request_middleware(self, request):
-        method = request.method
+    ``server_timing`` - if true, and ``timing`` is enabled, the durations are
+    sent to the client in the ``Server-Timing`` header.
 
-        # get all middleware for this method
-        if method in self._middleware:
-            procs = self._middleware[method]
-        else:
-            procs = self._middleware['__all__']
-
-        # iterate over all request processors. if at any point the processor
-        # returns a message that is not None, then we generate an HttpResponse
-        # object and return it
-        if procs.has_key('process_request'):
-            for proc in procs['process_request']:
-                mw_cls = proc.__self__
-
-                try:
-                    output = proc(resource=self, request=request)
-                except http.HttpStatusCode, e:
-                    output = e
-
-                if output is not None:
-                    if isinstance(output, HttpResponse):
-                        return output
-
-                    # custom method that may exist on the middleware class
-                    # for generating an HttpResponse object
-                    if hasattr(mw_cls, 'get_response'):
-                        return mw_cls.get_response(message=output,
-                            resource=self, request=request)
-
-                    if not isinstance(output, http.HttpStatusCode):
-                        output = (http.responses[mw_cls.status_code], output)
-
-                    return self._get_response(request, output)
+    ``stateless`` - if true, a single instance of the resource handles all
+    requests rather than an instance being created per request. The resource
+    methods must not set attributes on the instance, which is enforced when
+    ``DEBUG`` is true.
+    """
 
-    def _process_response_middleware(self, request, response):
-        method = request.method
+    __metaclass__ = ResourceMetaclass
 
-        # get all middleware for this method
-        if method in self._middleware:
-            procs = self._middleware[method]
-        else:
-            procs = self._middleware['__all__']
+    mimetypes = ('application/json',)
 
-        # iterate over all response processors. if at any point the processor
-        # returns a message that is not None, then we generate an HttpResponse
-        # object and return it
-        if procs.has_key('process_response'):
-            # iterate over all response processors
-            for proc in procs['process_response']:
-                mw_cls = proc.__self__
+    stateless = False
 
-                try:
-                    output = proc(resource=self, request=request, response=response)
-                except http.HttpStatusCode, e:
-                    output = e
+    timing = settings.RESOURCE_TIMING
+    server_timing = settings.SERVER_TIMING
 
-                if output is not None:
-                    if isinstance(output, HttpResponse):
-                        return output
+    middleware = settings.RESOURCE_MIDDLEWARE
 
-                    if hasattr(mw_cls, 'get_response'):
-                        return mw_cls.get_response(message=output,
-                            resource=self, request=request)
+    def __call__(self, request, *args, **kwargs):
+        # the arguments the resource method is called with, so they are
+        # available to the request middleware
+        request.resource_args = args
+        request.resource_kwargs = kwargs
 
-                    if not isinstance(output, http.HttpStatusCode):
-                        output = (http.responses[mw_cls.status_code], output)
+        # methods which are not allowed are processed by the middleware
+        # applicable to all methods
+        dispatch = self._dispatch.get(request.method)
+        if dispatch is None:
+            dispatch = self._dispatch['__all__']
 
-                    return self._get_response(request, output)
+        return dispatch(self, request, args, kwargs)
 
-    def _get_response(self, request, output):
+    def _get_response(self, request, output, encode=True):
         """Handles various output types from HTTP method calls.
 
             1. HttpResponse instance
@@ -304,6 +435,11 @@ class Resource(object):
             4. any other object
                 - will use a standard 200 status code
                 - this object will be encoded based on the 'Accept' header
+
+        If the content is a generator, each item is resolved and encoded as
+        the response is written. If ``encode`` is false, e.g. for HEAD
+        requests, the response only has the status and headers of the
+        content.
         """
 
         status = None
@@ -320,7 +456,8 @@ class Resource(object):
 
         # see if the output is a status/content pair, otherwise
         # assume the output is strictly content
-        elif output and type(output) in (list, tuple):
+        # note, the type is checked first so querysets are not evaluated
+        elif type(output) in (list, tuple) and output:
             if isinstance(output[0], http.HttpStatusCode):
                 status = output[0].status_code
                 content = output[1]
@@ -333,21 +470,53 @@ class Resource(object):
             content = output
 
         # test for a stream-type object i.e. a generator. if true, then
-        # do not process the content any further since it would be consumed
+        # the content must not be consumed here
         if inspect.isgenerator(content):
             streaming = True
 
         # if there is content then handle it appropriately
-        if content is not None:
+        if content is not None and not encode:
+            response = HttpResponse(status=status,
+                mimetype=getattr(request, 'accepttype', None))
+            streaming = False
+
+        elif content is not None:
             if hasattr(request, 'accepttype'):
-                # if marked as streaming, this accepttype is the assumed output
                 accepttype = request.accepttype
 
-                if not streaming:
-                    # attempt to resolve and encode the content based on the
-                    # accepttype
-                    content = self.resolve_fields(content)
-                    content = representation.encode(accepttype, content)
+                # the phases are only timed if enabled for the resource
+                timings = getattr(request, 'resource_timings', None)
+                if timings is not None:
+                    start = time.time()
+
+                # attempt to resolve and encode the content based on the
+                # accepttype. streams are resolved item by item
+                if streaming:
+                    content = (self._resolve_content(request, x) for x in content)
+                else:
+                    content = self._resolve_content(request, content)
+
+                    # the content may also be resolved lazily
+                    if inspect.isgenerator(content):
+                        streaming = True
+
+                if timings is not None:
+                    now = time.time()
+                    timings.append((RESOLVE, now - start))
+                    start = now
+
+                options = self._get_encode_options(request)
+
+                # streams are encoded incrementally as the response is written
+                if streaming:
+                    content = representation.encode_iter(accepttype, content,
+                        **options)
+                else:
+                    content = representation.encode(accepttype, content,
+                        **options)
+
+                if timings is not None:
+                    timings.append((ENCODE, time.time() - start))
 
                 response = HttpResponse(content, status=status, mimetype=accepttype)
             else:
@@ -355,8 +524,9 @@ class Resource(object):
         else:
             response = HttpResponse(status=status)
 
+        # the streaming middleware checks the request
         if streaming:
-            response.streaming = True
+            request.streaming = response.streaming = True
 
         return response
 
@@ -367,6 +537,23 @@ class Resource(object):
     def resolve_fields(cls, obj):
         return utils.convert_to_resource(obj)
 
+    def _resolve_content(self, request, content):
+        "Resolves the content of the response to ``request``."
+        return self.resolve_fields(content)
+
+    def _get_encode_options(self, request):
+        """Returns the keyword arguments passed to the representation when
+        encoding the content of the response to ``request``.
+        """
+        return {}
+
+    def get_head_headers(self, request, output):
+        """Returns a dict of additional headers for the response to a HEAD
+        request given the (unresolved) ``output`` of GET. Since the content is
+        not resolved for HEAD requests, this should be kept cheap.
+        """
+        return {}
+
 
 class ResourceCollectionMetaclass(ResourceMetaclass):
     def __new__(cls, name, bases, attrs):
@@ -0,0 +1,308 @@
+import time
+import threading
+from hashlib import md5
+from collections import OrderedDict
+
+from django.db.models import signals
+
+from restlib.conf import settings
+from restlib.utils import import_class
+from restlib.resources.timing import get_sink
+from restlib.resources import utils
+
+__all__ = ('LRUBackend', 'DjangoCacheBackend', 'RepresentationCache',
+    'ModelGenerations', 'get_backend', 'registry', 'generations')
+
+def _new_generation():
+    # generations which are lost (e.g. evicted from a shared cache) are
+    # replaced by a value that has not been used before
+    return int(time.time() * 1000)
+
+
+class LRUBackend(object):
+    """An in-process cache which evicts the least recently used entries once
+    ``max_size`` entries are held. Since each process has its own cache,
+    entries are only invalidated by the signals sent within the process.
+    """
+    def __init__(self, max_size=None):
+        if max_size is None:
+            max_size = settings.REPRESENTATION_CACHE_SIZE
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return None
+            self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_generation(self, key):
+        # generations start at a value that has not been used before, so they
+        # differ from those of previous (or other) processes
+        with self._lock:
+            if key not in self._generations:
+                self._generations[key] = _new_generation()
+            return self._generations[key]
+
+    def incr_generation(self, key):
+        with self._lock:
+            if key in self._generations:
+                self._generations[key] += 1
+            else:
+                self._generations[key] = _new_generation()
+
+
+class DjangoCacheBackend(object):
+    """Stores entries in one of the caches defined in the Django ``CACHES``
+    setting, so they can be shared across processes.
+    """
+    def __init__(self, alias='default', timeout=None):
+        from django.core.cache import get_cache
+
+        self.cache = get_cache(alias)
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def get_generation(self, key):
+        generation = self.cache.get(key)
+
+        if generation is None:
+            self.cache.add(key, _new_generation())
+            generation = self.cache.get(key)
+
+        return generation
+
+    def incr_generation(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, _new_generation())
+
+
+_backends = {}
+
+def get_backend(backend):
+    """Returns a cache backend instance for the ``representation_cache``
+    attribute of a resource. ``True`` denotes the default backend defined by
+    the ``REPRESENTATION_CACHE_BACKEND`` setting. Backends referenced by path
+    are shared by all resources using the same path.
+    """
+    if backend is True:
+        backend = settings.REPRESENTATION_CACHE_BACKEND
+
+    if not isinstance(backend, basestring):
+        return backend
+
+    if backend not in _backends:
+        _backends[backend] = import_class(backend, 'cache backend')()
+
+    return _backends[backend]
+
+
+# all representation caches which have been created
+registry = []
+
+class RepresentationCache(object):
+    """Caches the resolved representations of the model objects of a
+    ``ModelResource`` keyed by their ``pk``.
+
+    Entries are invalidated when the object is saved or deleted. Since the
+    representation may contain nested related objects, any change to the
+    models the field plan depends on invalidates all entries of the resource.
+    """
+    def __init__(self, resource, backend):
+        self.resource = resource
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._connected = False
+        # the counts are updated by concurrent requests of threaded servers
+        self._lock = threading.Lock()
+
+        # the key is stable across processes so it can be used with shared
+        # cache backends
+        ident = '%s.%s:%s:%r' % (resource.__module__, resource.__name__,
+            resource.model._meta, resource.fields)
+        self.prefix = 'restlib:%s' % md5(ident).hexdigest()
+        self.generation_key = '%s:generation' % self.prefix
+
+        registry.append(self)
+
+    def __repr__(self):
+        return '<RepresentationCache: %s (%d hits, %d misses)>' % (
+            self.resource.__name__, self.hits, self.misses)
+
+    def _get_key(self, pk):
+        generation = self.backend.get_generation(self.generation_key)
+        return '%s:%s:%s' % (self.prefix, generation, pk)
+
+    def connect(self):
+        "Connects the signals which invalidate the entries of this cache."
+        uid = '%s:%d' % (self.prefix, id(self))
+        model = self.resource.model
+
+        for signal in (signals.post_save, signals.post_delete):
+            signal.connect(self._object_changed, sender=model, weak=False,
+                dispatch_uid=uid)
+
+        dependencies = utils.get_plan_dependencies(self.resource._plan)
+
+        for dependency in dependencies:
+            for signal in (signals.post_save, signals.post_delete,
+                signals.m2m_changed):
+                signal.connect(self._dependency_changed, sender=dependency,
+                    weak=False, dispatch_uid=uid + ':dependency')
+
+        self._connected = True
+
+    def _object_changed(self, sender, instance, **kwargs):
+        self.invalidate(instance.pk)
+
+    def _dependency_changed(self, sender, **kwargs):
+        self.invalidate()
+
+    def invalidate(self, pk=None):
+        """Invalidates the entry for ``pk`` or, if not given, all entries of
+        this cache.
+        """
+        if pk is None:
+            self.backend.incr_generation(self.generation_key)
+        else:
+            self.backend.delete(self._get_key(pk))
+
+    def get(self, obj):
+        if not self._connected:
+            self.connect()
+
+        value = self.backend.get(self._get_key(obj.pk))
+
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+
+        # sinks which collect metrics, e.g. ``MetricsSink``, count these too
+        record = getattr(get_sink(), 'record_cache', None)
+        if record is not None:
+            record(self.resource, value is not None)
+
+        return value
+
+    def set(self, obj, value):
+        self.backend.set(self._get_key(obj.pk), value)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': float(hits) / total if total else 0.0,
+        }
+
+
+def _get_concrete_model(model):
+    # deferred classes (see ``QuerySet.only``) and proxy models share the
+    # generation of the model they are derived from
+    while model._meta.proxy:
+        model = model._meta.proxy_for_model
+    return model
+
+
+class ModelGenerations(object):
+    """Keeps a generation number per model which is incremented whenever an
+    object of the model is saved or deleted, or a many-to-many relationship
+    of the model changes. The generations are held by the backend defined by
+    the ``GENERATION_BACKEND`` setting.
+
+    Since the generations are only incremented by the signals sent within a
+    process, all processes changing objects must have connected the signals
+    when using a shared backend. This is done when a resource is defined with
+    ``generation_etags``.
+
+    Changes which do not send the signals, i.e. ``QuerySet.update``, bulk
+    deletes of related objects via raw SQL and any other raw SQL, do not
+    increment the generations, so ``incr`` must be called for the models
+    changed. Otherwise clients may keep stale representations.
+    """
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._connected = False
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_backend(settings.GENERATION_BACKEND)
+        return self._backend
+
+    def _get_key(self, model):
+        return 'restlib:generation:%s' % _get_concrete_model(model)._meta
+
+    def connect(self):
+        "Connects the signals which increment the generations of the models."
+        if self._connected:
+            return
+
+        uid = 'restlib:generations:%d' % id(self)
+
+        for signal in (signals.post_save, signals.post_delete):
+            signal.connect(self._model_changed, weak=False, dispatch_uid=uid)
+        signals.m2m_changed.connect(self._m2m_changed, weak=False,
+            dispatch_uid=uid)
+
+        self._connected = True
+
+    def _model_changed(self, sender, **kwargs):
+        self.incr(sender)
+
+    def _m2m_changed(self, sender, instance, action, model, **kwargs):
+        if action.startswith('post_'):
+            for x in set([sender, instance.__class__, model]):
+                self.incr(x)
+
+    def get(self, model):
+        return self.backend.get_generation(self._get_key(model))
+
+    def get_many(self, models):
+        """Returns a tuple of the generations of ``models`` ordered by the
+        models, so it can be compared across processes.
+        """
+        keys = sorted([self._get_key(x) for x in set(models)])
+        return tuple([self.backend.get_generation(x) for x in keys])
+
+    def incr(self, model):
+        self.backend.incr_generation(self._get_key(model))
+
+
+# the generations used by resources defined with ``generation_etags``
+generations = ModelGenerations()
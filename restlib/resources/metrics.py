@@ -0,0 +1,386 @@
+import os
+import mmap
+import glob
+import struct
+import threading
+from bisect import bisect_left
+
+from django.http import HttpResponse
+from django.utils import simplejson
+
+from restlib.conf import settings
+from restlib.resources.base import Resource
+from restlib.resources.timing import TOTAL, HistogramSink, get_sink
+
+__all__ = ('LocalStore', 'FileStore', 'MetricsSink', 'MetricsResource',
+    'get_store', 'render')
+
+# the upper bounds in seconds of the buckets of the request duration histogram
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+    2.5, 5.0, 10.0)
+
+# the metrics which are exported, in order, with their type and help text
+METRICS = (
+    ('restlib_requests_total', 'counter',
+        'The number of requests by resource, method and status code.'),
+    ('restlib_request_duration_seconds', 'histogram',
+        'The duration of requests by resource and method.'),
+    ('restlib_response_bytes_total', 'counter',
+        'The number of bytes encoded for (non-streamed) responses by resource '
+        'and method.'),
+    ('restlib_representation_cache_hits_total', 'counter',
+        'The number of representations read from the cache by resource.'),
+    ('restlib_representation_cache_misses_total', 'counter',
+        'The number of representations not found in the cache by resource.'),
+    ('restlib_representation_cache_hit_ratio', 'gauge',
+        'The ratio of representations read from the cache by resource.'),
+)
+
+# the number of bytes the files of the ``FileStore`` are grown by
+PAGE_SIZE = 64 * 1024
+
+_header = struct.Struct('<I4x')
+_length = struct.Struct('<I')
+_value = struct.Struct('<d')
+
+
+def _get_key(name, labels):
+    # keys are stable across processes, so the values can be summed
+    return simplejson.dumps([name, sorted(labels.items())])
+
+def _parse_key(key):
+    name, labels = simplejson.loads(key)
+    return name, tuple([tuple(x) for x in labels])
+
+
+class LocalStore(object):
+    "Holds the values of the metrics in memory, so they are local to a process."
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = float(value)
+
+    def collect(self):
+        with self._lock:
+            return dict(self._values)
+
+
+def _read_entries(data):
+    """Returns the ``(key, value, offset)`` entries in the ``data`` of a file
+    written by ``_MappedFile``.
+    """
+    used = _header.unpack_from(data, 0)[0]
+    pos = _header.size
+
+    while pos < used:
+        length = _length.unpack_from(data, pos)[0]
+        pos += _length.size
+        key = data[pos:pos + length]
+
+        # values are aligned to 8 bytes
+        pos += length + (-(_length.size + length) % 8)
+        yield key, _value.unpack_from(data, pos)[0], pos
+        pos += _value.size
+
+
+class _MappedFile(object):
+    """A memory mapped file of keys and values written by a single process.
+    The values are updated in place, so reading them from other processes
+    requires no coordination.
+    """
+    def __init__(self, filename):
+        self._fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0644)
+
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            size = PAGE_SIZE
+            os.ftruncate(self._fd, size)
+
+        self._size = size
+        self._map = mmap.mmap(self._fd, size)
+        self._used = _header.unpack_from(self._map, 0)[0] or _header.size
+
+        self._positions = {}
+        for key, value, pos in _read_entries(self._map):
+            self._positions[key] = pos
+
+    def _add(self, key):
+        length = len(key)
+        padding = -(_length.size + length) % 8
+        end = self._used + _length.size + length + padding + _value.size
+
+        if end > self._size:
+            while end > self._size:
+                self._size += PAGE_SIZE
+            os.ftruncate(self._fd, self._size)
+            self._map.resize(self._size)
+
+        pos = self._used
+        _length.pack_into(self._map, pos, length)
+        pos += _length.size
+        self._map[pos:pos + length] = key
+        pos += length + padding
+        _value.pack_into(self._map, pos, 0.0)
+
+        # the entry is only visible to readers once it is complete
+        self._used = end
+        _header.pack_into(self._map, 0, end)
+
+        self._positions[key] = pos
+        return pos
+
+    def get_position(self, key):
+        try:
+            return self._positions[key]
+        except KeyError:
+            return self._add(key)
+
+    def incr(self, key, amount):
+        pos = self.get_position(key)
+        _value.pack_into(self._map, pos, _value.unpack_from(self._map, pos)[0]
+            + amount)
+
+    def set(self, key, value):
+        _value.pack_into(self._map, self.get_position(key), value)
+
+
+class FileStore(object):
+    """Holds the values of the metrics of each process in a memory mapped file
+    in the directory ``path``, so the values of all processes on the machine,
+    e.g. pre-forked workers, are summed when collected. The files of processes
+    which have exited are kept, so counters never decrease.
+
+    The directory should be emptied when the server is (re)started.
+    """
+    _open_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._file = None
+        self._lock = None
+
+    def _get_file(self):
+        pid = os.getpid()
+
+        # a process forked after the file has been opened uses its own file
+        if self._pid != pid:
+            with self._open_lock:
+                if self._pid != pid:
+                    self._file = _MappedFile(os.path.join(self.path,
+                        'restlib_%d.db' % pid))
+                    self._lock = threading.Lock()
+                    self._pid = pid
+
+        return self._file, self._lock
+
+    def incr(self, key, amount=1):
+        mapped, lock = self._get_file()
+        with lock:
+            mapped.incr(key, amount)
+
+    def set(self, key, value):
+        mapped, lock = self._get_file()
+        with lock:
+            mapped.set(key, value)
+
+    def collect(self):
+        values = {}
+
+        for filename in glob.glob(os.path.join(self.path, 'restlib_*.db')):
+            with open(filename, 'rb') as f:
+                data = f.read()
+
+            if len(data) < _header.size:
+                continue
+
+            for key, value, pos in _read_entries(data):
+                values[key] = values.get(key, 0.0) + value
+
+        return values
+
+
+_store = None
+
+def get_store():
+    """Returns the store of the metrics. If the ``METRICS_DIR`` setting is
+    defined, a ``FileStore`` shared by the processes on the machine is used,
+    otherwise the metrics are local to the process.
+    """
+    global _store
+
+    if _store is None:
+        if settings.METRICS_DIR:
+            _store = FileStore(settings.METRICS_DIR)
+        else:
+            _store = LocalStore()
+
+    return _store
+
+
+def _get_name(resource):
+    return '%s.%s' % (resource.__module__, resource.__name__)
+
+
+class MetricsSink(HistogramSink):
+    """A timing sink which, in addition to the histograms of each phase, keeps
+    the counters exported by ``MetricsResource``. Use this as the
+    ``TIMING_SINK`` and enable ``RESOURCE_TIMING`` (or the ``timing``
+    attribute of the resources) to collect the metrics.
+    """
+    def __init__(self, store=None):
+        super(MetricsSink, self).__init__()
+        self._store = store
+        self._keys = {}
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
+    def _get_key(self, name, **labels):
+        # the keys are cached since they are the same for most requests
+        ident = (name, tuple(sorted(labels.items())))
+
+        try:
+            return self._keys[ident]
+        except KeyError:
+            key = self._keys[ident] = _get_key(name, labels)
+            return key
+
+    def record(self, resource, method, timings, response=None):
+        super(MetricsSink, self).record(resource, method, timings, response)
+
+        store = self.store
+        name = _get_name(resource)
+
+        status = response is not None and response.status_code or 0
+        store.incr(self._get_key('restlib_requests_total', resource=name,
+            method=method, status=str(status)))
+
+        for phase, seconds in timings:
+            if phase != TOTAL:
+                continue
+
+            index = bisect_left(BUCKETS, seconds)
+            le = index < len(BUCKETS) and repr(BUCKETS[index]) or '+Inf'
+
+            store.incr(self._get_key('restlib_request_duration_seconds_bucket',
+                resource=name, method=method, le=le))
+            store.incr(self._get_key('restlib_request_duration_seconds_sum',
+                resource=name, method=method), seconds)
+            store.incr(self._get_key('restlib_request_duration_seconds_count',
+                resource=name, method=method))
+
+        # the content of streamed responses is not available until written
+        if response is not None and not getattr(response, 'streaming', False):
+            store.incr(self._get_key('restlib_response_bytes_total',
+                resource=name, method=method), len(response.content))
+
+    def record_cache(self, resource, hit):
+        """Counts a hit (or miss if not ``hit``) of the representation cache
+        of the resource class ``resource``. This is called by the cache.
+        """
+        if hit:
+            name = 'restlib_representation_cache_hits_total'
+        else:
+            name = 'restlib_representation_cache_misses_total'
+
+        self.store.incr(self._get_key(name, resource=_get_name(resource)))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_sample(name, labels, value):
+    if labels:
+        name = '%s{%s}' % (name, ','.join(['%s="%s"' % (k, _escape(v))
+            for k, v in labels]))
+    return '%s %r' % (name, float(value))
+
+def _get_bucket_order(labels):
+    le = dict(labels)['le']
+    return le == '+Inf' and float('inf') or float(le)
+
+def render(values):
+    """Returns the metrics ``values``, as returned by the ``collect`` method of
+    a store, in the Prometheus text exposition format.
+    """
+    samples = {}
+    for key, value in values.iteritems():
+        name, labels = _parse_key(key)
+        samples.setdefault(name, []).append((labels, value))
+
+    # the hit ratio is derived from the summed hits and misses, either of
+    # which may not have been counted yet
+    hits = dict(samples.get('restlib_representation_cache_hits_total', ()))
+    misses = dict(samples.get('restlib_representation_cache_misses_total', ()))
+    ratios = []
+    for labels in set(hits) | set(misses):
+        total = hits.get(labels, 0.0) + misses.get(labels, 0.0)
+        ratios.append((labels, total and hits.get(labels, 0.0) / total or 0.0))
+    samples['restlib_representation_cache_hit_ratio'] = ratios
+
+    lines = []
+
+    for name, kind, text in METRICS:
+        lines.append('# HELP %s %s' % (name, text))
+        lines.append('# TYPE %s %s' % (name, kind))
+
+        if kind != 'histogram':
+            for labels, value in sorted(samples.get(name, ())):
+                lines.append(_format_sample(name, labels, value))
+            continue
+
+        # the buckets are stored per bucket, but exported cumulatively
+        series = {}
+        for labels, value in samples.get(name + '_bucket', ()):
+            common = tuple([x for x in labels if x[0] != 'le'])
+            series.setdefault(common, []).append((labels, value))
+
+        for common in sorted(series):
+            buckets = dict([(dict(labels)['le'], value)
+                for labels, value in series[common]])
+            count = 0.0
+
+            for le in [repr(x) for x in BUCKETS] + ['+Inf']:
+                count += buckets.get(le, 0.0)
+                lines.append(_format_sample(name + '_bucket',
+                    common + (('le', le),), count))
+
+            for suffix in ('_sum', '_count'):
+                value = dict(samples.get(name + suffix, ())).get(common, 0.0)
+                lines.append(_format_sample(name + suffix, common, value))
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsResource(Resource):
+    """Exports the metrics collected by ``MetricsSink`` in the Prometheus text
+    exposition format, e.g. in ``urls.py``::
+
+        url(r'^metrics/$', MetricsResource)
+
+    The request counts, status codes, durations and bytes encoded are only
+    collected for resources with ``timing`` enabled. When ``METRICS_DIR`` is
+    defined, the metrics of all processes using the directory are exported.
+    """
+    middleware = ('restlib.resources.middleware.client.MethodNotAllowed',)
+
+    mimetype = 'text/plain; version=0.0.4; charset=utf-8'
+
+    # the scrapes themselves are not measured
+    timing = False
+
+    def GET(self, request):
+        # the store of the sink the metrics are recorded to, if any
+        store = getattr(get_sink(), 'store', None) or get_store()
+        return HttpResponse(render(store.collect()), mimetype=self.mimetype)
@@ -51,6 +51,28 @@ class NotAcceptable(object):
                 status=self.status_code)
 
 
+class SparseFieldsets(object):
+    """Limits the fields of the resolved representation to those requested by
+    the ``fields`` query parameter, e.g. ``?fields=name,author(name),tags``.
+    This only applies to resources that define ``get_fieldset``.
+    """
+    methods = ('GET', 'HEAD')
+    status_code = 400
+
+    param = 'fields'
+
+    def process_request(self, resource, request, **kwargs):
+        fields = request.GET.get(self.param)
+
+        if not fields or not hasattr(resource, 'get_fieldset'):
+            return
+
+        try:
+            request.fieldset = resource.get_fieldset(fields)
+        except ValueError, e:
+            return str(e)
+
+
 class RequestURITooLong(object):
     status_code = 414
 
@@ -0,0 +1,67 @@
+import time
+
+from django.http import HttpResponse
+from django.utils.http import (http_date, parse_http_date_safe, parse_etags,
+    quote_etag)
+
+
+class NotModified(object):
+    """Responds with a 304 'Not Modified' if the validators of the requested
+    resource match the 'If-None-Match' or 'If-Modified-Since' headers. This
+    only applies to resources which define ``get_validators``, which are
+    expected to be cheaper than handling the request. The validators are also
+    set on the response if not already present.
+    """
+    methods = ('GET', 'HEAD')
+    status_code = 304
+
+    def _set_headers(self, request, response):
+        if request.etag is not None and not response.has_header('ETag'):
+            response['ETag'] = 'W/%s' % quote_etag(request.etag)
+
+        if request.last_modified is not None and \
+            not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(request.last_modified)
+
+    def process_request(self, resource, request, **kwargs):
+        if not hasattr(resource, 'get_validators'):
+            return
+
+        etag, last_modified = resource.get_validators(request,
+            *getattr(request, 'resource_args', ()),
+            **getattr(request, 'resource_kwargs', {}))
+
+        request.etag = etag
+        request.last_modified = None
+
+        if last_modified is not None:
+            request.last_modified = int(time.mktime(last_modified.timetuple()))
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+
+        # the entity tags take precedence over the modification date
+        if if_none_match:
+            if etag is None:
+                return
+
+            etags = parse_etags(if_none_match)
+            if etag not in etags and '*' not in etags:
+                return
+
+        elif if_modified_since:
+            if_modified_since = parse_http_date_safe(if_modified_since)
+
+            if request.last_modified is None or if_modified_since is None or \
+                request.last_modified > if_modified_since:
+                return
+        else:
+            return
+
+        response = HttpResponse(status=self.status_code)
+        self._set_headers(request, response)
+        return response
+
+    def process_response(self, resource, request, response, **kwargs):
+        if response.status_code == 200 and hasattr(request, 'etag'):
+            self._set_headers(request, response)
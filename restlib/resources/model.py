@@ -1,17 +1,36 @@
 import inspect
+from hashlib import md5
 
 from django.db import models
+from django.db.models import Count, Max, Sum
 from django.db.models import loading
+from django.db.models.query import QuerySet
+from django.utils.http import urlencode
 from django.utils.importlib import import_module
 
 from restlib import http
+from restlib.conf import settings
 from restlib.resources.base import (ResourceMetaclass, Resource,
     ResourceCollection, ResourceCollectionMetaclass)
-from restlib.resources import utils
+from restlib.resources import utils, cache
 
 
 __all__ = ('ModelResource', 'ModelResourceCollection')
 
+# fieldsets requested by clients keyed by the resource and the fields
+_fieldsets = cache.LRUBackend(max_size=settings.FIELDSET_CACHE_SIZE)
+
+def _get_etag(resource, request, values):
+    """Returns an entity tag for the representation of ``values`` by
+    ``resource`` for ``request``. The representation also depends on the
+    mimetype and the query parameters, e.g. the fields or the page.
+    """
+    cls = resource.__class__
+    params = sorted(request.GET.items())
+    ident = '%s.%s:%s:%r:%r' % (cls.__module__, cls.__name__,
+        getattr(request, 'accepttype', None), params, tuple(values))
+    return md5(ident).hexdigest()
+
 def _get_model(model):
     if isinstance(model, basestring):
         path = model.split('.')
@@ -43,6 +62,10 @@ class ModelResourceMetaclass(ResourceMetaclass):
     # reference the required fields for a related object.
     _defaults = {}
 
+    # resources created on the fly for related objects keyed by the model
+    # and fields they represent. see ``get_resource_for_model``
+    _related = {}
+
     def __new__(cls, name, bases, attrs):
         # get all attributes from bases which are not currently set
         new_cls = super(ModelResourceMetaclass, cls).__new__(cls, name, bases, attrs)
@@ -75,11 +98,30 @@ class ModelResourceMetaclass(ResourceMetaclass):
             new_cls.exclude = utils.parse_attr_selectors(model, new_cls.exclude,
                 new_cls)
 
+            # compile the selectors into the accessors used when resolving
+            # each object, so this work is not repeated per object
+            new_cls._plan = utils.compile_field_plan(model, new_cls.fields,
+                new_cls.exclude, new_cls)
+
+            # flat resources can be resolved from the rows themselves rather
+            # than model instances, see ``queryset_to_resource``
+            new_cls._columns = utils.get_plan_columns(new_cls._plan)
+
+            if new_cls.representation_cache:
+                new_cls._representation_cache = cache.RepresentationCache(new_cls,
+                    cache.get_backend(new_cls.representation_cache))
+            else:
+                new_cls._representation_cache = None
+
+            if new_cls.generation_etags:
+                cache.generations.connect()
+
             # register the model and the associated ModelResource class
             if new_cls.default_for_related:
                 if model in cls._defaults:
                     raise KeyError, 'default resource for "%s" already defined' % model.__name__
                 cls._defaults[model] = new_cls
+                utils.clear_nested_resources()
 
         return new_cls
 
@@ -111,10 +153,57 @@ class ModelResource(Resource):
     # those model objects
     default_for_related = True
 
+    # caches the resolved representation of each model object. this may be
+    # ``True`` for the default backend, the path to a backend class or a
+    # backend instance. see ``restlib.resources.cache``
+    representation_cache = None
+
+    # the name of a timestamp field, e.g. a ``DateTimeField`` with
+    # ``auto_now``, and/or a field holding a version which is incremented
+    # whenever the object changes. if defined, the ETag and Last-Modified
+    # validators are computed with a single query, so conditional requests
+    # can be answered before the request is handled. see
+    # ``restlib.resources.middleware.redirection.NotModified``
+    timestamp_field = None
+    version_field = None
+
+    # if true, the ETag validator is derived from the generations of the
+    # models the representation depends on, including related models, rather
+    # than queried. see ``restlib.resources.cache.ModelGenerations``. note,
+    # changes made by ``QuerySet.update`` or raw SQL do not send the signals
+    # which increment the generations
+    generation_etags = False
+
     @classmethod
     def queryset(cls, request):
         return cls.model._default_manager.all()
 
+    @classmethod
+    def get_fieldset(cls, fields):
+        """Returns a ``Fieldset`` of this resource limited to ``fields``, e.g.
+        ``name,author(name),tags``. A ``ValueError`` is raised if ``fields``
+        refers to fields not defined by the resource. The most recently used
+        fieldsets are cached.
+        """
+        key = (cls, fields)
+        fieldset = _fieldsets.get(key)
+
+        if fieldset is None:
+            fieldset = utils.Fieldset(cls, utils.select_plan(cls.model,
+                cls._plan, utils.parse_fieldset(fields)))
+            _fieldsets.set(key, fieldset)
+
+        return fieldset
+
+    @classmethod
+    def get_generations(cls):
+        """Returns the generations of the model and all models the compiled
+        field plan depends on. No queries are required.
+        """
+        models = utils.get_plan_dependencies(cls._plan)
+        models.add(cls.model)
+        return cache.generations.get_many(models)
+
     @classmethod
     def get(cls, request, **kwargs):
         try:
@@ -129,6 +218,42 @@ class ModelResource(Resource):
     def resolve_fields(cls, obj):
         return utils.convert_to_resource(obj, resource=cls)
 
+    def _resolve_content(self, request, content):
+        # use the fieldset requested by the client, if any. see
+        # ``restlib.resources.middleware.client.SparseFieldsets``
+        fieldset = getattr(request, 'fieldset', None)
+        if fieldset is None:
+            return self.resolve_fields(content)
+        return fieldset.resolve_fields(content)
+
+    def _get_encode_options(self, request):
+        # tabular representations use the fields as the columns
+        resource = getattr(request, 'fieldset', None) or self
+        return {'columns': [accessor.key for accessor in resource._plan]}
+
+    def get_validators(self, request, pk=None, **kwargs):
+        """Returns the entity tag and last modified date of the object with
+        ``pk`` using a single lookup of the timestamp and version fields.
+        """
+        if self.generation_etags:
+            return _get_etag(self, request, (pk,) + self.get_generations()), None
+
+        fields = [x for x in (self.timestamp_field, self.version_field) if x]
+
+        if not fields or pk is None:
+            return None, None
+
+        values = self.queryset(request).filter(pk=pk).values_list(*fields)[:1]
+
+        # the object does not exist, so the request must be handled
+        if not values:
+            return None, None
+
+        values = values[0]
+        last_modified = values[0] if self.timestamp_field else None
+
+        return _get_etag(self, request, values), last_modified
+
     def GET(self, request, pk):
         obj = self.get(request, pk=pk)
         if obj is None:
@@ -172,15 +297,165 @@ class ModelResourceCollection(ResourceCollection):
 
     __metaclass__ = ModelResourceCollectionMetaclass
 
+    # collections may also be represented as one record per line, which is
+    # suited for streaming
+    mimetypes = ('application/json', 'application/x-ndjson', 'text/csv')
+
+    # if true, querysets are resolved with the ``select_related`` and
+    # ``prefetch_related`` lookups required by the resource's fields, so the
+    # number of queries does not depend on the size of the collection
+    prefetch_related = True
+
+    # if true, querysets are read in chunks of ``chunk_size`` rows which are
+    # resolved and encoded as the response is written, rather than all at once
+    streaming = False
+    chunk_size = 1000
+
+    # if set, collections are paginated by cursor rather than returned in
+    # full. ``paginate_by`` is the default number of objects per page which
+    # clients may change up to ``max_page_size`` using the ``limit`` query
+    # parameter. pages are keyed on the ``ordering`` fields, which should be
+    # indexed, and the ``Link`` header refers to the next and previous pages
+    paginate_by = None
+    max_page_size = 100
+    ordering = ('pk',)
+
+    cursor_param = 'cursor'
+    limit_param = 'limit'
+
     # this is defined as a class method since it really is only referencing
     # class attributes and it may be referenced by another Resource while
     # being processed
     @classmethod
     def resolve_fields(cls, obj):
-        return utils.convert_to_resource(obj, resource=cls.resource)
+        return cls._resolve(obj, cls.resource)
+
+    @classmethod
+    def _resolve(cls, obj, resource):
+        if isinstance(obj, QuerySet):
+            if cls.streaming:
+                return utils.stream_queryset_to_resource(obj,
+                    resource=resource, chunk_size=cls.chunk_size,
+                    prefetch=cls.prefetch_related)
+
+            obj = utils.defer_fields(obj, resource)
+
+            if cls.prefetch_related:
+                obj = utils.prefetch_queryset(obj, resource._plan)
+            else:
+                obj = utils.batch_queryset(obj, resource._plan)
+
+        return utils.convert_to_resource(obj, resource=resource)
+
+    @classmethod
+    def get_fieldset(cls, fields):
+        return cls.resource.get_fieldset(fields)
+
+    def _resolve_content(self, request, content):
+        fieldset = getattr(request, 'fieldset', None)
+        if fieldset is None:
+            return self.resolve_fields(content)
+        return self._resolve(content, fieldset)
+
+    def _get_encode_options(self, request):
+        resource = getattr(request, 'fieldset', None) or self.resource
+        return {'columns': [accessor.key for accessor in resource._plan]}
+
+    def paginate(self, request, queryset):
+        """Returns the page of ``queryset`` requested by the ``cursor`` and
+        ``limit`` query parameters. The page is set on the request, so the
+        ``Link`` header can be set on the response.
+        """
+        limit = request.GET.get(self.limit_param)
+
+        if limit is None:
+            limit = self.paginate_by
+        else:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+
+            if limit < 1:
+                raise ValueError('The limit must be a positive integer')
+
+        ordering = utils.get_ordering(self.model, self.ordering)
+
+        request.page = utils.paginate_queryset(queryset, ordering,
+            min(limit, self.max_page_size), request.GET.get(self.cursor_param))
+
+        return request.page
+
+    def get_validators(self, request, *args, **kwargs):
+        """Returns the entity tag and last modified date of the collection
+        using a single aggregate query of the timestamp and version fields
+        of the resource. Along with the number, largest and sum of the primary
+        keys of the objects, changes to any object (including deletions and
+        replacements) result in a new entity tag. Replacing an object with
+        one with the same primary key, timestamp and version is not detected.
+
+        Only the fields of the objects themselves are aggregated, so changes
+        to nested related objects, e.g. renaming the author of a book, do
+        not change the entity tag. Use ``generation_etags`` for those.
+        """
+        resource = self.resource
+
+        if resource.generation_etags:
+            return _get_etag(self, request, resource.get_generations()), None
+
+        if not resource.timestamp_field and not resource.version_field:
+            return None, None
+
+        # the count alone does not change when an object is deleted and
+        # another created with the same (or an older) timestamp or version
+        aggregates = {'count': Count('pk'), 'max_pk': Max('pk'),
+            'sum_pk': Sum('pk')}
+
+        if resource.timestamp_field:
+            aggregates['timestamp'] = Max(resource.timestamp_field)
+
+        if resource.version_field:
+            aggregates['version'] = Sum(resource.version_field)
+
+        values = self.queryset(request).aggregate(**aggregates)
+        etag = _get_etag(self, request, [values.get(x) for x in
+            ('timestamp', 'version', 'count', 'max_pk', 'sum_pk')])
+
+        return etag, values.get('timestamp')
+
+    def _get_response(self, request, output, **kwargs):
+        response = super(ModelResourceCollection, self)._get_response(request,
+            output, **kwargs)
+
+        page = getattr(request, 'page', None)
+
+        if page is not None:
+            links = []
+
+            for rel in ('next', 'prev'):
+                cursor = getattr(page, rel)
+
+                if cursor is not None:
+                    params = dict(request.GET.items())
+                    params[self.cursor_param] = cursor
+                    links.append('<%s?%s>; rel="%s"' % (request.path,
+                        urlencode(params), rel))
+
+            if links:
+                response['Link'] = ', '.join(links)
+
+        return response
 
     def GET(self, request):
-        return self.queryset(request)
+        queryset = self.queryset(request)
+
+        if self.paginate_by:
+            try:
+                return self.paginate(request, queryset).queryset
+            except ValueError, e:
+                return http.BAD_REQUEST, str(e)
+
+        return queryset
 
 
 def get_or_create_resource(model, force=False, **attrs):
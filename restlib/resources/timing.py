@@ -0,0 +1,143 @@
+import threading
+from bisect import bisect_left
+
+from restlib.conf import settings
+from restlib.utils import import_class
+
+__all__ = ('Histogram', 'HistogramSink', 'get_sink', 'get_percentiles',
+    'format_server_timing')
+
+# the phases of a request which are always timed. the processors of each
+# middleware are timed as ``request.<name>`` and ``response.<name>``
+TOTAL = 'total'
+HANDLER = 'handler'
+RESOLVE = 'resolve'
+ENCODE = 'encode'
+
+# the upper bounds in seconds of the histogram buckets, growing by a factor
+# of 2 ** (1/8.) from 10 microseconds to about 3 minutes. percentiles are
+# interpolated within a bucket, so the error is below 10%
+BUCKETS = tuple([1e-5 * 2 ** (i / 8.) for i in xrange(8 * 24 + 1)])
+
+
+class Histogram(object):
+    """A thread-safe histogram of durations in seconds with a fixed set of
+    exponential buckets. Recording a value is constant time and memory does
+    not grow with the number of values.
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # the last count is of the values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Histogram: %d values>' % self.count
+
+    def add(self, value):
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def percentile(self, percent):
+        """Returns the estimated value below which ``percent`` of the values
+        fall, or ``None`` if there are no values.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+
+        if not count:
+            return None
+
+        rank = count * percent / 100.0
+        seen = 0
+
+        for index, n in enumerate(counts):
+            if n and seen + n >= rank:
+                break
+            seen += n
+
+        # values above the largest bucket are reported as the largest bucket
+        if index == len(self.buckets):
+            return self.buckets[-1]
+
+        upper = self.buckets[index]
+        lower = self.buckets[index - 1] if index else 0.0
+
+        return lower + (upper - lower) * (rank - seen) / n
+
+
+class HistogramSink(object):
+    """Aggregates the timings of each phase in a ``Histogram`` per resource
+    class and method. The histograms are local to the process.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def get_histogram(self, resource, method, phase):
+        key = (resource, method, phase)
+
+        try:
+            return self.histograms[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            return self.histograms.setdefault(key, Histogram())
+
+    def record(self, resource, method, timings, response=None):
+        """Records the list of ``(phase, seconds)`` pairs for a request to
+        ``method`` of the resource class ``resource`` which was answered with
+        ``response``.
+        """
+        for phase, seconds in timings:
+            self.get_histogram(resource, method, phase).add(seconds)
+
+    def percentiles(self, resource, method, phase=TOTAL,
+        percents=(50, 95, 99)):
+        histogram = self.histograms.get((resource, method, phase))
+
+        if histogram is None:
+            return dict([('p%d' % x, None) for x in percents])
+
+        return dict([('p%d' % x, histogram.percentile(x)) for x in percents])
+
+
+_sinks = {}
+
+def get_sink(sink=None):
+    """Returns the sink instance timings are recorded to, which is defined by
+    the ``TIMING_SINK`` setting if ``sink`` is not given. Sinks referenced by
+    path are shared by all resources.
+    """
+    if sink is None:
+        sink = settings.TIMING_SINK
+
+    if not isinstance(sink, basestring):
+        return sink
+
+    if sink not in _sinks:
+        _sinks[sink] = import_class(sink, 'timing sink')()
+
+    return _sinks[sink]
+
+
+def get_percentiles(resource, method, phase=TOTAL):
+    """Returns the 50th, 95th and 99th percentile in seconds of ``phase`` of
+    the requests to ``method`` of ``resource`` recorded by the default sink,
+    e.g. ``{'p50': 0.002, 'p95': 0.011, 'p99': 0.034}``.
+    """
+    return get_sink().percentiles(resource, method, phase)
+
+
+def format_server_timing(timings):
+    "Returns the ``Server-Timing`` header value for ``timings``."
+    return ', '.join(['%s;dur=%.3f' % (phase, seconds * 1000)
+        for phase, seconds in timings])
@@ -1,2 +1,6 @@
 from restlib.resources.utils.header import *
 from restlib.resources.utils.resolve import *
+from restlib.resources.utils.plan import *
+from restlib.resources.utils.prefetch import *
+from restlib.resources.utils.fieldsets import *
+from restlib.resources.utils.pagination import *
@@ -0,0 +1,120 @@
+from restlib.resources.utils.resolve import (resolver, convert_to_resource,
+    PSEUDO_SELECTORS)
+from restlib.resources.utils.plan import (RELATED, MANAGER, get_plan_columns,
+    get_plan_only, get_nested_resource)
+
+__all__ = ('parse_fieldset', 'select_plan', 'Fieldset')
+
+def parse_fieldset(text):
+    """Parses a fieldset requested by a client, e.g. ``name,author(name),tags``
+    into the nested selectors ``('name', ('author', 'name'), 'tags')`` as they
+    would be defined for the ``fields`` of a resource.
+    """
+    stack = [[]]
+    name = ''
+
+    for char in text:
+        if char not in ',()':
+            name += char
+            continue
+
+        name = name.strip()
+
+        # start a nested set of selectors for the preceding name
+        if char == '(':
+            if not name:
+                raise ValueError('Nested fields must follow a field name')
+            stack.append([name])
+
+        else:
+            if name:
+                stack[-1].append(name)
+
+            if char == ')':
+                if len(stack) == 1:
+                    raise ValueError('Unbalanced parentheses in fields')
+
+                node = tuple(stack.pop())
+                if len(node) == 1:
+                    raise ValueError('No nested fields defined for "%s"' % node[0])
+                stack[-1].append(node)
+
+        name = ''
+
+    name = name.strip()
+    if name:
+        stack[-1].append(name)
+
+    if len(stack) != 1:
+        raise ValueError('Unbalanced parentheses in fields')
+
+    return tuple(stack[0])
+
+
+def select_plan(model, plan, selectors):
+    """Returns the subset of accessors in ``plan`` which are referenced by
+    ``selectors``. Selectors refer to the keys of the resolved objects and
+    pseudo-selectors are expanded as they would be by ``parse_attr_selectors``.
+    A ``ValueError`` is raised for any selector not defined by ``plan``.
+    """
+    accessors = dict([(accessor.key, accessor) for accessor in plan])
+    selected = []
+
+    for selector in selectors:
+        nested = None
+
+        if type(selector) is tuple:
+            nested = selector[1:]
+            selector = selector[0]
+
+        # pseudo-selectors are limited to the fields available
+        if selector in PSEUDO_SELECTORS:
+            if nested:
+                raise ValueError('Pseudo-selectors cannot have nested fields')
+
+            for name in resolver.get_local_model_field(model, selector):
+                if name in accessors and accessors[name] not in selected:
+                    selected.append(accessors[name])
+            continue
+
+        if selector not in accessors:
+            raise ValueError('"%s" is not a valid field' % selector)
+
+        accessor = accessors[selector]
+
+        if nested:
+            if accessor.kind not in (RELATED, MANAGER):
+                raise ValueError('"%s" does not support nested fields' % selector)
+
+            resource = get_nested_resource(accessor)
+            fieldset = Fieldset(resource, select_plan(accessor.model,
+                resource._plan, nested))
+            accessor = accessor.copy(resource=fieldset)
+
+        if accessor not in selected:
+            selected.append(accessor)
+
+    return tuple(selected)
+
+
+class Fieldset(object):
+    """A view of a ``ModelResource`` limited to a subset of its fields. All
+    other attributes are those of the resource, so resource methods can still
+    be referenced.
+    """
+    def __init__(self, resource, plan):
+        self.resource = resource
+        self._plan = plan
+        self._columns = get_plan_columns(plan)
+        self._only = get_plan_only(plan)
+        self._representation_cache = None
+
+    def resolve_fields(self, obj):
+        return convert_to_resource(obj, resource=self)
+
+    def __getattr__(self, name):
+        return getattr(self.resource, name)
+
+    def __repr__(self):
+        return '<Fieldset: %s (%s)>' % (self.resource.__name__,
+            ', '.join([accessor.key for accessor in self._plan]))
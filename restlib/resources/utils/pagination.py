@@ -0,0 +1,167 @@
+import base64
+
+from django.core import exceptions
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
+from django.utils import simplejson
+
+__all__ = ('Page', 'get_ordering', 'encode_cursor', 'decode_cursor',
+    'paginate_queryset')
+
+# the directions a cursor may page in
+NEXT = 'n'
+PREV = 'p'
+
+
+def get_ordering(model, ordering):
+    """Normalizes ``ordering`` into a tuple of ``(field, descending)`` pairs
+    for the local fields of ``model``. The primary key is appended if not
+    present, so the ordering is unique.
+    """
+    pk = model._meta.pk
+    normalized = []
+
+    for name in ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+
+        if name == 'pk':
+            field = pk
+        else:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise exceptions.ImproperlyConfigured('"%s" is not a field of '
+                    'the model "%s"' % (name, model.__name__))
+
+        normalized.append((field, descending))
+
+    if pk not in [field for field, descending in normalized]:
+        normalized.append((pk, False))
+
+    return tuple(normalized)
+
+
+def _encode_value(value):
+    if value is None or isinstance(value, (int, long, float, basestring)):
+        return value
+    return unicode(value)
+
+def encode_cursor(direction, values):
+    "Returns an opaque cursor for paging in ``direction`` from ``values``."
+    data = simplejson.dumps([direction, [_encode_value(x) for x in values]])
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+def decode_cursor(cursor, ordering):
+    """Returns the direction and the key values of ``cursor`` for the
+    normalized ``ordering``. A ``ValueError`` is raised for invalid cursors.
+    """
+    try:
+        data = base64.urlsafe_b64decode(str(cursor) + '=' * (-len(cursor) % 4))
+        direction, values = simplejson.loads(data)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+    if direction not in (NEXT, PREV) or not isinstance(values, list) or \
+        len(values) != len(ordering):
+        raise ValueError('Invalid cursor')
+
+    try:
+        values = [field.to_python(x) for (field, d), x in zip(ordering, values)]
+    except (exceptions.ValidationError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    return direction, values
+
+
+def _get_order_by(ordering, reverse=False):
+    return ['%s%s' % ('-' if descending != reverse else '', field.attname)
+        for field, descending in ordering]
+
+def _get_keyset_filter(ordering, values, forward, inclusive):
+    """Returns a ``Q`` object matching the rows which come after (or before if
+    not ``forward``) the row with the key ``values`` in ``ordering``.
+    """
+    q = None
+    equal = {}
+
+    for (field, descending), value in zip(ordering, values):
+        lookup = 'gt' if forward != descending else 'lt'
+        term = Q(**{'%s__%s' % (field.attname, lookup): value})
+
+        if equal:
+            term &= Q(**equal)
+        q = term if q is None else q | term
+
+        equal[field.attname] = value
+
+    if inclusive:
+        q |= Q(**equal)
+
+    return q
+
+
+class Page(object):
+    """A page of a queryset. ``queryset`` contains the objects of the page in
+    the ordering of the pagination, while ``next`` and ``prev`` are the
+    cursors of the adjacent pages, if any.
+    """
+    def __init__(self, queryset, next=None, prev=None):
+        self.queryset = queryset
+        self.next = next
+        self.prev = prev
+
+    def __repr__(self):
+        return '<Page: next=%r, prev=%r>' % (self.next, self.prev)
+
+
+def paginate_queryset(queryset, ordering, limit, cursor=None):
+    """Returns the ``Page`` of ``queryset`` with at most ``limit`` objects
+    which follows (or precedes) ``cursor``, or the first page if no cursor is
+    given. ``ordering`` must be normalized by ``get_ordering`` and should be
+    backed by an index. Unlike offsets, the cost of a page is independent of
+    how deep it is. The values of the ordering fields must not be null.
+
+    Two queries are required for a page; the keys of the page (plus one to
+    determine whether there are more) and the objects within those keys. The
+    queryset of the page is not evaluated, so it can also be streamed.
+    """
+    direction, values = NEXT, None
+
+    if cursor:
+        direction, values = decode_cursor(cursor, ordering)
+
+    forward = direction == NEXT
+    keys = queryset.order_by(*_get_order_by(ordering, reverse=not forward))
+
+    if values is not None:
+        keys = keys.filter(_get_keyset_filter(ordering, values, forward, False))
+
+    attnames = [field.attname for field, descending in ordering]
+    keys = list(keys.values_list(*attnames)[:limit + 1])
+
+    more = len(keys) > limit
+    keys = keys[:limit]
+
+    if not keys:
+        return Page(queryset.none())
+
+    if not forward:
+        keys.reverse()
+
+    first, last = keys[0], keys[-1]
+
+    queryset = queryset.filter(_get_keyset_filter(ordering, first, True, True),
+        _get_keyset_filter(ordering, last, False, True))
+    queryset = queryset.order_by(*_get_order_by(ordering))[:limit]
+
+    page = Page(queryset)
+
+    # paging forward from the first page implies there is no previous page,
+    # while paging backwards implies there is a next page
+    if more or not forward:
+        page.next = encode_cursor(NEXT, last)
+    if values is not None and (forward or more):
+        page.prev = encode_cursor(PREV, first)
+
+    return page
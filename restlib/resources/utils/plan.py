@@ -0,0 +1,374 @@
+from django.db import models
+from django.db.models.related import RelatedObject
+
+from restlib.resources.utils.resolve import (resolver, convert_to_resource,
+    objects_to_resource, get_resource_for_model)
+
+__all__ = ('compile_field_plan', 'get_plan_columns', 'get_plan_only',
+    'get_nested_resource', 'get_nested_plan', 'get_plan_dependencies',
+    'clear_nested_resources', 'is_pk_only', 'is_pk_reference',
+    'ATTRIBUTE', 'RELATED', 'MANAGER',
+    'CALLABLE', 'METHOD', 'DYNAMIC')
+
+# the getter kinds an accessor may be compiled into
+ATTRIBUTE = 'attribute'
+RELATED = 'related'
+MANAGER = 'manager'
+CALLABLE = 'callable'
+METHOD = 'method'
+DYNAMIC = 'dynamic'
+
+# the name of the dict set on model objects holding related objects which
+# have been prefetched by restlib, keyed by the accessor name
+PREFETCH_CACHE_NAME = '_resource_prefetch_cache'
+
+# the name of the dict set on model objects holding the key of the pk in the
+# resolved objects and the pks of related objects which have been fetched in a
+# batch, keyed by the accessor name. see ``batch_objects``
+BATCH_CACHE_NAME = '_resource_batch_cache'
+
+# incremented when the resources returned by ``get_nested_resource`` may have
+# changed, so the resources memoized by the accessors are looked up again
+_nested_generation = 0
+
+
+class FieldAccessor(object):
+    """A precompiled getter for a single field of a ``ModelResource``.
+
+    ``key`` - the name of the attribute in the resolved object
+    ``attr`` - the name of the attribute on the model object or resource
+    ``fields`` - the nested selectors for related objects, if any
+    ``model`` - the related model class for relationships, if any
+    ``field`` - the model field or ``RelatedObject`` for the attribute, if any
+    ``resource`` - the resource for related objects. if not defined, it is
+    determined by the ``model`` and ``fields``
+    """
+    kind = None
+
+    # the arguments of the accessor, see ``copy``
+    _attrs = ('key', 'attr', 'fields', 'model', 'field', 'resource')
+
+    __slots__ = _attrs + ('_nested',)
+
+    def __init__(self, key, attr, fields=None, model=None, field=None,
+        resource=None):
+        self.key = key
+        self.attr = attr
+        self.fields = fields
+        self.model = model
+        self.field = field
+        self.resource = resource
+        # the generation and resource memoized by ``get_nested_resource``
+        self._nested = None
+
+    def __repr__(self):
+        return '<%s: %s (%s)>' % (self.__class__.__name__, self.key, self.kind)
+
+    def copy(self, **attrs):
+        "Returns a copy of this accessor with ``attrs`` replaced."
+        for name in self._attrs:
+            attrs.setdefault(name, getattr(self, name))
+        return self.__class__(**attrs)
+
+    def resolve(self, obj, resource):
+        raise NotImplementedError
+
+
+class AttributeAccessor(FieldAccessor):
+    "A concrete, non-relational column. The value is used as is."
+    kind = ATTRIBUTE
+
+    __slots__ = ()
+
+    def resolve(self, obj, resource):
+        return getattr(obj, self.attr)
+
+
+class RelatedAccessor(FieldAccessor):
+    "A foreign key or reverse one-to-one relationship to a single object."
+    kind = RELATED
+
+    __slots__ = ()
+
+    def resolve(self, obj, resource):
+        return convert_to_resource(getattr(obj, self.attr),
+            resource=self.resource, fields=self.fields)
+
+
+class ForeignKeyAccessor(RelatedAccessor):
+    """A forward foreign key or one-to-one relationship referring to the pk of
+    the related model.
+    """
+    __slots__ = ()
+
+    def resolve(self, obj, resource):
+        nested = get_nested_resource(self)
+
+        # the pk is read from the local column, so the related object is not
+        # fetched
+        if is_pk_only(nested):
+            value = getattr(obj, self.field.attname)
+            if value is None:
+                return None
+            return {nested._plan[0].key: value}
+
+        return convert_to_resource(getattr(obj, self.attr), resource=nested)
+
+
+class ManagerAccessor(FieldAccessor):
+    "A many-to-many or reverse foreign key relationship."
+    kind = MANAGER
+
+    __slots__ = ()
+
+    def resolve(self, obj, resource):
+        batch = obj.__dict__.get(BATCH_CACHE_NAME)
+        if batch is not None and self.attr in batch:
+            key, pks = batch[self.attr]
+            return [{key: pk} for pk in pks]
+
+        cache = obj.__dict__.get(PREFETCH_CACHE_NAME)
+        if cache is not None and self.attr in cache:
+            return objects_to_resource(cache[self.attr], self.model,
+                resource=self.resource, fields=self.fields)
+
+        return convert_to_resource(getattr(obj, self.attr).all(),
+            resource=self.resource, fields=self.fields)
+
+
+class CallableAccessor(FieldAccessor):
+    "A method defined on the model class, e.g. ``get_absolute_url``."
+    kind = CALLABLE
+
+    __slots__ = ()
+
+    def resolve(self, obj, resource):
+        return convert_to_resource(getattr(obj, self.attr)(), fields=self.fields)
+
+
+class DynamicAccessor(FieldAccessor):
+    """An attribute which cannot be classified until runtime, e.g. properties
+    or attributes set on the instance. This mirrors the original interpretive
+    resolution.
+    """
+    kind = DYNAMIC
+
+    __slots__ = ()
+
+    def _get_value(self, obj, resource):
+        if hasattr(obj, self.attr):
+            return getattr(obj, self.attr)
+        return getattr(resource, self.attr)(obj)
+
+    def resolve(self, obj, resource):
+        value = self._get_value(obj, resource)
+
+        # call if a callable
+        if callable(value):
+            value = value()
+
+        # handle a local many-to-many or a reverse foreign key
+        elif value.__class__.__name__ in ('RelatedManager', 'ManyRelatedManager'):
+            value = value.all()
+
+        return convert_to_resource(value, fields=self.fields)
+
+
+class MethodAccessor(DynamicAccessor):
+    "A method defined on the resource which takes the model object."
+    kind = METHOD
+
+    __slots__ = ()
+
+    def _get_value(self, obj, resource):
+        return getattr(resource, self.attr)(obj)
+
+
+def _get_accessor_class(model, attr, field, resource):
+    if field is not None:
+        if isinstance(field, models.ManyToManyField):
+            return ManagerAccessor
+
+        # reverse relationships are either a manager or, in the case of a
+        # one-to-one, the single related object
+        if isinstance(field, RelatedObject):
+            if field.field.rel.multiple:
+                return ManagerAccessor
+            return RelatedAccessor
+
+        if field.rel:
+            if field.rel.get_related_field().primary_key:
+                return ForeignKeyAccessor
+            return RelatedAccessor
+
+        return AttributeAccessor
+
+    if hasattr(model, attr):
+        if callable(getattr(model, attr)):
+            return CallableAccessor
+        return DynamicAccessor
+
+    if hasattr(resource, attr):
+        return MethodAccessor
+
+    return DynamicAccessor
+
+
+def compile_field_plan(model, fields, exclude, resource):
+    """Compiles the parsed ``fields`` and ``exclude`` selectors of a resource
+    into a tuple of ``FieldAccessor``s. This is done once per resource class,
+    so resolving each object only involves running the accessors.
+    """
+    plan = []
+    model_fields = resolver._get_fields(model)[':all']
+
+    for field in fields:
+        nested = None
+
+        # this implies a nested relationship, but with explicitly defined
+        # fields
+        if type(field) is tuple:
+            nested = field[1:]
+            field = field[0]
+
+        key = field
+        if '->' in field:
+            field, key = field.split('->')
+
+        if field in exclude:
+            continue
+
+        model_field = model_fields.get(field)
+        klass = _get_accessor_class(model, field, model_field, resource)
+
+        plan.append(klass(key, field, fields=nested,
+            model=resolver.get_model_relation(model, field), field=model_field))
+
+    return tuple(plan)
+
+
+def _has_descriptor(field):
+    # fields such as ``FileField`` or those using ``SubfieldBase`` set a
+    # descriptor on the model class which converts the value of the column.
+    # the descriptors cannot be read from the class, so the dicts are checked
+    for klass in field.model.__mro__:
+        if field.attname in klass.__dict__:
+            return True
+    return False
+
+
+def get_plan_columns(plan):
+    """Returns the names of the columns read by ``plan`` if it consists only
+    of concrete, non-relational columns whose values are used as is. Otherwise
+    ``None`` is returned since model instances are required to resolve the
+    fields.
+    """
+    if not plan:
+        return
+
+    for accessor in plan:
+        if accessor.kind != ATTRIBUTE or _has_descriptor(accessor.field):
+            return
+
+    return tuple([accessor.attr for accessor in plan])
+
+
+def get_nested_resource(accessor):
+    """Returns the resource used to resolve the related objects of
+    ``accessor``. This is determined at runtime since the default resource of
+    the related model may be defined after the plan is compiled.
+    """
+    if accessor.resource is not None:
+        return accessor.resource
+
+    nested = accessor._nested
+    if nested is not None and nested[0] == _nested_generation:
+        return nested[1]
+
+    resource, created = get_resource_for_model(accessor.model,
+        fields=accessor.fields)
+    accessor._nested = (_nested_generation, resource)
+    return resource
+
+
+def clear_nested_resources():
+    """Clears the resources memoized by ``get_nested_resource``. This must be
+    called when the default resource of a model is defined.
+    """
+    global _nested_generation
+    _nested_generation += 1
+
+
+def is_pk_only(resource):
+    "Returns true if ``resource`` consists of only the pk of its model."
+    columns = getattr(resource, '_columns', None)
+    pk = resource.model._meta.pk
+    return columns in ((pk.name,), (pk.attname,))
+
+
+def is_pk_reference(accessor):
+    """Returns true if ``accessor`` resolves to the pk of the related object
+    using the local column alone.
+    """
+    return isinstance(accessor, ForeignKeyAccessor) and \
+        is_pk_only(get_nested_resource(accessor))
+
+
+def get_nested_plan(accessor):
+    "Returns the plan of the resource returned by ``get_nested_resource``."
+    return get_nested_resource(accessor)._plan
+
+
+def get_plan_only(plan):
+    """Returns the names of the fields to be passed to ``QuerySet.only`` when
+    fetching the objects for ``plan``. ``None`` is returned if the plan may
+    access any attribute of the objects, e.g. via methods.
+    """
+    names = []
+
+    for accessor in plan:
+        if accessor.kind == ATTRIBUTE:
+            names.append(accessor.attr)
+
+        # forward foreign keys require the local column, everything else
+        # only depends on the pk
+        elif accessor.kind in (RELATED, MANAGER):
+            if not isinstance(accessor.field, RelatedObject) and \
+                accessor.kind == RELATED:
+                names.append(accessor.attr)
+
+        else:
+            return
+
+    return tuple(names)
+
+
+def get_plan_dependencies(plan, _seen=None):
+    """Returns the set of models, including the intermediate models of
+    many-to-many relationships, the output of ``plan`` depends on. The model
+    of the plan itself is not included unless it is related to.
+    """
+    if _seen is None:
+        _seen = set()
+
+    # relationships may be cyclic, so each plan is only walked once
+    _seen.add(id(plan))
+    models = set()
+
+    for accessor in plan:
+        if accessor.kind not in (RELATED, MANAGER):
+            continue
+
+        field = accessor.field
+        if isinstance(field, RelatedObject):
+            field = field.field
+
+        if hasattr(field.rel, 'through'):
+            models.add(field.rel.through)
+        models.add(accessor.model)
+
+        nested = get_nested_plan(accessor)
+        if id(nested) not in _seen:
+            models.update(get_plan_dependencies(nested, _seen))
+
+    return models
@@ -0,0 +1,258 @@
+from django.db import models
+from django.db.models.query import QuerySet
+from django.db.models.related import RelatedObject
+
+from restlib.resources.utils.resolve import defer_fields
+from restlib.resources.utils.plan import (RELATED, MANAGER,
+    PREFETCH_CACHE_NAME, BATCH_CACHE_NAME, get_nested_plan,
+    get_nested_resource, is_pk_only, is_pk_reference)
+
+__all__ = ('get_related_lookups', 'prefetch_queryset', 'prefetch_objects',
+    'get_batched_accessors', 'batch_queryset', 'batch_objects')
+
+# ``prefetch_related`` was introduced in Django 1.4. for prior versions the
+# related objects are prefetched here
+NATIVE_PREFETCH = hasattr(QuerySet, 'prefetch_related')
+
+if NATIVE_PREFETCH:
+    from django.db.models.query import \
+        prefetch_related_objects as native_prefetch_related_objects
+
+def _is_forward(accessor):
+    return not isinstance(accessor.field, RelatedObject)
+
+def get_related_lookups(plan, prefix='', select=True):
+    """Walks the relationships of a compiled field plan, including nested
+    plans, and returns a two-tuple of the lookups that can be passed to
+    ``select_related`` and ``prefetch_related`` respectively.
+
+    Only chains of forward foreign keys can be selected. Everything else, as
+    well as any relationship below a prefetched one, must be prefetched.
+    Foreign keys which are only represented by their pk are skipped since the
+    local column is sufficient.
+    """
+    selected, prefetched = [], []
+
+    for accessor in plan:
+        if accessor.kind not in (RELATED, MANAGER) or is_pk_reference(accessor):
+            continue
+
+        lookup = prefix + accessor.attr
+        nested = get_nested_plan(accessor)
+
+        if select and accessor.kind == RELATED and _is_forward(accessor):
+            selected.append(lookup)
+            _selected, _prefetched = get_related_lookups(nested,
+                lookup + '__', select=True)
+        else:
+            prefetched.append(lookup)
+            _selected, _prefetched = get_related_lookups(nested,
+                lookup + '__', select=False)
+
+        selected.extend(_selected)
+        prefetched.extend(_prefetched)
+
+    return tuple(selected), tuple(prefetched)
+
+
+def _get_related_queryset(accessor, required=()):
+    # only the columns of the nested resource are fetched, along with the
+    # ``required`` columns used to group the objects
+    resource = get_nested_resource(accessor)
+    queryset = defer_fields(accessor.model._default_manager.all(), resource,
+        required)
+
+    selected = get_related_lookups(resource._plan)[0]
+    if selected:
+        queryset = queryset.select_related(*selected)
+    return queryset
+
+def _set_prefetched(obj, attr, related):
+    obj.__dict__.setdefault(PREFETCH_CACHE_NAME, {})[attr] = related
+
+def _prefetch_many_to_many(objs, accessor):
+    field = accessor.field
+
+    # determine which side of the intermediate table refers to ``objs``
+    if isinstance(field, RelatedObject):
+        field = field.field
+        source, target = field.m2m_reverse_field_name(), field.m2m_field_name()
+    else:
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+
+    pks = set([obj.pk for obj in objs])
+
+    rows = field.rel.through._default_manager\
+        .filter(**{'%s__in' % source: pks}).values_list(source, target)
+
+    groups = {}
+    for source_pk, target_pk in rows:
+        groups.setdefault(source_pk, []).append(target_pk)
+
+    # the related objects are fetched separately, so the ordering (and any
+    # filtering) of the default manager is preserved
+    queryset = _get_related_queryset(accessor)
+    related = list(queryset.filter(pk__in=set([t for s, t in rows])))
+    positions = dict([(x.pk, i) for i, x in enumerate(related)])
+
+    for obj in objs:
+        indexes = [positions[x] for x in groups.get(obj.pk, ()) if x in positions]
+        indexes.sort()
+        _set_prefetched(obj, accessor.attr, [related[i] for i in indexes])
+
+    return related
+
+def _prefetch_reverse_foreign_key(objs, accessor):
+    fk = accessor.field.field
+    attname = fk.rel.get_related_field().attname
+
+    values = set([getattr(obj, attname) for obj in objs])
+
+    queryset = _get_related_queryset(accessor, (fk.name,))
+    related = list(queryset.filter(**{'%s__in' % fk.name: values}))
+
+    groups = {}
+    for x in related:
+        groups.setdefault(getattr(x, fk.attname), []).append(x)
+
+    for obj in objs:
+        value = getattr(obj, attname)
+
+        if fk.rel.multiple:
+            _set_prefetched(obj, accessor.attr, groups.get(value, []))
+        # reverse one-to-one relationships use the descriptor's cache. objects
+        # without a related object are left alone so the ``DoesNotExist`` is
+        # raised as usual
+        elif value in groups:
+            setattr(obj, accessor.field.get_cache_name(), groups[value][0])
+
+    return related
+
+def _batch_accessor(objs, accessor):
+    field = accessor.field
+
+    # determine the lookup from the related model back to ``objs`` and the
+    # value of ``objs`` it refers to
+    if isinstance(field, RelatedObject):
+        lookup = field.field.name
+        if isinstance(field.field, models.ManyToManyField):
+            attname = field.parent_model._meta.pk.attname
+        else:
+            attname = field.field.rel.get_related_field().attname
+    else:
+        lookup = field.related_query_name()
+        attname = field.model._meta.pk.attname
+
+    values = set([getattr(obj, attname) for obj in objs])
+
+    # the related model is queried, rather than the intermediate table, so
+    # the ordering (and any filtering) of the default manager is preserved
+    rows = accessor.model._default_manager\
+        .filter(**{'%s__in' % lookup: values}).values_list(lookup, 'pk')
+
+    groups = {}
+    for value, pk in rows:
+        groups.setdefault(value, []).append(pk)
+
+    # the key is the same for all objects, so it is only determined once
+    key = get_nested_plan(accessor)[0].key
+
+    for obj in objs:
+        obj.__dict__.setdefault(BATCH_CACHE_NAME, {})[accessor.attr] = \
+            (key, groups.get(getattr(obj, attname), []))
+
+def _prefetch_objects(objs, plan):
+    if not objs:
+        return
+
+    for accessor in plan:
+        if accessor.kind not in (RELATED, MANAGER) or is_pk_reference(accessor):
+            continue
+
+        # only the pks of the related objects are needed
+        if accessor.kind == MANAGER and is_pk_only(get_nested_resource(accessor)):
+            _batch_accessor(objs, accessor)
+            continue
+
+        nested = get_nested_plan(accessor)
+
+        if accessor.kind == RELATED and _is_forward(accessor):
+            # forward foreign keys have already been selected
+            related = [getattr(obj, accessor.attr) for obj in objs]
+            related = [x for x in related if x is not None]
+        elif isinstance(accessor.field, RelatedObject) and \
+            not isinstance(accessor.field.field, models.ManyToManyField):
+            related = _prefetch_reverse_foreign_key(objs, accessor)
+        else:
+            related = _prefetch_many_to_many(objs, accessor)
+
+        _prefetch_objects(related, nested)
+
+def prefetch_objects(objs, plan):
+    """Prefetches all relationships in ``plan`` that cannot be selected for
+    the list of model objects ``objs``. Each relationship costs a constant
+    number of queries regardless of the number of objects.
+
+    The objects are expected to have been fetched with the ``select_related``
+    lookups of ``plan``.
+    """
+    if NATIVE_PREFETCH:
+        prefetched = get_related_lookups(plan)[1]
+        if prefetched:
+            native_prefetch_related_objects(objs, prefetched)
+    else:
+        _prefetch_objects(objs, plan)
+
+def prefetch_queryset(queryset, plan):
+    """Applies ``select_related`` and ``prefetch_related`` to ``queryset`` for
+    every relationship in ``plan``. If ``prefetch_related`` is not supported,
+    the queryset is evaluated and a list of prefetched objects is returned.
+    """
+    selected, prefetched = get_related_lookups(plan)
+
+    if not selected and not prefetched:
+        return queryset
+
+    if selected:
+        queryset = queryset.select_related(*selected)
+
+    if NATIVE_PREFETCH:
+        if prefetched:
+            queryset = queryset.prefetch_related(*prefetched)
+        return queryset
+
+    objs = list(queryset)
+    _prefetch_objects(objs, plan)
+    return objs
+
+
+def get_batched_accessors(plan):
+    """Returns the many-to-many and reverse foreign key accessors of ``plan``
+    which only require the pks of the related objects.
+    """
+    return [accessor for accessor in plan if accessor.kind == MANAGER and
+        is_pk_only(get_nested_resource(accessor))]
+
+def batch_objects(objs, plan):
+    """Fetches the pks of the related objects of the accessors returned by
+    ``get_batched_accessors`` for the list of model objects ``objs``. A single
+    query is required for each relationship regardless of the number of
+    objects, so this is useful even if the relationships are not prefetched.
+    """
+    if not objs:
+        return
+
+    for accessor in get_batched_accessors(plan):
+        _batch_accessor(objs, accessor)
+
+def batch_queryset(queryset, plan):
+    """Evaluates ``queryset`` and returns the list of objects with the
+    related objects batched by ``batch_objects``. If there is nothing to
+    batch, the queryset is returned as is.
+    """
+    if not get_batched_accessors(plan):
+        return queryset
+
+    objs = list(queryset)
+    batch_objects(objs, plan)
+    return objs
@@ -1,3 +1,5 @@
+from itertools import islice
+
 from django.db import models
 from django.db.models.query import QuerySet
 
@@ -75,8 +77,13 @@ class ModelFieldResolver(object):
 
         if attr in fields[':all']:
             related = fields[':all'][attr]
-            if isinstance(related, models.ManyToManyField):
-                return related.rel.to
+            # local foreign keys and many-to-many fields point to the model
+            # they reference, while reverse relationships refer to the model
+            # defining the relationship
+            if isinstance(related, models.Field):
+                if related.rel:
+                    return related.rel.to
+                return
             return related.model
 
 
@@ -127,80 +134,178 @@ def parse_attr_selectors(model, attrs, resource):
     return tuple(level)
 
 
+def _normalize_selectors(fields):
+    "Returns the selectors as nested tuples so they can be used as a key."
+    return tuple([_normalize_selectors(x) if type(x) in (tuple, list) else x
+        for x in fields])
+
+
 def get_resource_for_model(model, fields=None):
     """Gets the default resource for this model. This should only be used when
     dealing with related objects. This is invoked when a resource associated
     with this model does not exist.
+
+    Resources created for explicitly defined ``fields`` (or for the ``pk``
+    fallback) are memoized by the model and the fields, so each shape is only
+    created once.
     """
-    from restlib.resources.model import get_or_create_resource
+    from restlib.resources.model import (get_or_create_resource,
+        ModelResourceMetaclass)
+
+    # if fields are already defined, this forces the creation of a new
+    # resource since it explicitly defines fields. otherwise use the default
+    # resource for the model with a fallback to just the ``pk`` field
+    if not fields:
+        resource = ModelResourceMetaclass._defaults.get(model, None)
+        if resource is not None:
+            return resource, False
+        fields = (':pk',)
+
+    key = (model, _normalize_selectors(fields))
+    resource = ModelResourceMetaclass._related.get(key, None)
 
-    # these two lines may seem confusing, but if fields are already defined,
-    # this will force the creation of a new resource since it explicitly
-    # defines fields. the second line is to fallback to just the ``pk``
-    # field of the ``model``
-    force = True if fields else False
-    fields = fields or (':pk',)
+    if resource is not None:
+        return resource, False
 
-    return get_or_create_resource(model, force=force,
+    resource, created = get_or_create_resource(model, force=True,
         fields=fields)
+    ModelResourceMetaclass._related[key] = resource
 
+    return resource, created
 
-def queryset_to_resource(obj, resource=None, fields=None, depth=0):
-    model = obj.model
 
+def objects_to_resource(objs, model, resource=None, fields=None):
+    """Converts an iterable of ``model`` objects using a single resource
+    rather than looking one up for each object.
+    """
     if resource is None:
         resource, created = get_resource_for_model(model, fields=fields)
 
-    return [model_to_resource(x, resource=resource) for x in iter(obj)]
+    return [model_to_resource(x, resource=resource) for x in iter(objs)]
 
 
-def model_to_resource(obj, resource=None, fields=None, depth=0):
-    """Takes a model object or queryset and converts it into a native object
-    given the list of attributes either local or related to the object.
+def defer_fields(obj, resource, required=()):
+    """Limits the columns fetched by the queryset ``obj`` to those required by
+    ``resource``, if it defines them (see ``Fieldset``), and the fields named
+    by ``required``. Querysets which have already been evaluated are returned
+    as is.
     """
-    from restlib.resources import ModelResource
+    only = getattr(resource, '_only', None)
 
-    if resource is None or not (isinstance(resource, ModelResource) or
-        issubclass(resource, ModelResource)):
-        resource, created = get_resource_for_model(obj.__class__, fields=fields)
+    if only and obj._result_cache is None:
+        return obj.only(*(only + tuple(required)))
+    return obj
 
-    new_obj = {}
 
-    for field in resource.fields:
-        fields = None
+def queryset_to_resource(obj, resource=None, fields=None, depth=0):
+    if resource is None:
+        resource, created = get_resource_for_model(obj.model, fields=fields)
+
+    obj = defer_fields(obj, resource)
+
+    columns = getattr(resource, '_columns', None)
+
+    # if the resource only consists of concrete columns, fetch the rows
+    # directly rather than creating model instances. querysets that have
+    # already been evaluated are used as is and distinct querysets must
+    # select all columns to not collapse rows
+    if columns and obj._result_cache is None and not obj.query.distinct:
+        keys = [accessor.key for accessor in resource._plan]
+        return [dict(zip(keys, row)) for row in obj.values_list(*columns)]
+
+    return objects_to_resource(obj, obj.model, resource=resource)
+
 
-        # this implies a nested relationship, but with explicitly defined
-        # fields
-        if type(field) is tuple:
-            fields = field[1:]
-            field = field[0]
+def stream_queryset_to_resource(obj, resource=None, fields=None,
+    chunk_size=1000, prefetch=False):
+    """Generator which reads the queryset ``obj`` in chunks of ``chunk_size``
+    rows using ``QuerySet.iterator`` and yields each resolved object. Unlike
+    ``queryset_to_resource`` the result cache of the queryset is not filled,
+    so memory is bounded by the chunk size rather than size of the queryset.
 
-        key = field
-        if '->' in field:
-            field, key = field.split('->')
+    If ``prefetch`` is true, related objects are selected and prefetched for
+    each chunk. Otherwise, only the pks of related objects are batched.
+    """
+    from restlib.resources.utils.prefetch import (get_related_lookups,
+        prefetch_objects, batch_objects)
+
+    if resource is None:
+        resource, created = get_resource_for_model(obj.model, fields=fields)
+
+    obj = defer_fields(obj, resource)
+    columns = getattr(resource, '_columns', None)
+
+    if columns and not obj.query.distinct:
+        keys = [accessor.key for accessor in resource._plan]
+        for row in obj.values_list(*columns).iterator():
+            yield dict(zip(keys, row))
+        return
+
+    if prefetch:
+        selected = get_related_lookups(resource._plan)[0]
+        if selected:
+            obj = obj.select_related(*selected)
 
-        # only apply exclude to the first level since other depths need to
-        # be explicitly defined
-        if depth == 0 and field in resource.exclude:
-            continue
+    iterator = obj.iterator()
 
-        # test to see if the field is on the obj/model
-        if hasattr(obj, field):
-            value = getattr(obj, field)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
 
-        # fallback to a local resource method, pass in the object
+        if prefetch:
+            prefetch_objects(chunk, resource._plan)
         else:
-            value = getattr(resource, field)(obj)
+            batch_objects(chunk, resource._plan)
+
+        for x in chunk:
+            yield model_to_resource(x, resource=resource)
+
+
+def _copy_resolved(obj):
+    """Returns a deep copy of the resolved object ``obj``. Containers are
+    copied recursively, while other values, e.g. strings, numbers and dates,
+    are immutable and shared.
+    """
+    if isinstance(obj, dict):
+        return dict([(k, _copy_resolved(v)) for k, v in obj.iteritems()])
+    if isinstance(obj, list):
+        return [_copy_resolved(x) for x in obj]
+    if isinstance(obj, tuple):
+        return tuple([_copy_resolved(x) for x in obj])
+    if isinstance(obj, (set, frozenset)):
+        return obj.__class__([_copy_resolved(x) for x in obj])
+    return obj
 
-        # call if a callable
-        if callable(value):
-            value = value()
 
-        # handle a local many-to-many or a reverse foreign key
-        elif value.__class__.__name__ in ('RelatedManager', 'ManyRelatedManager'):
-            value = value.all()
+def model_to_resource(obj, resource=None, fields=None, depth=0):
+    """Takes a model object or queryset and converts it into a native object
+    given the list of attributes either local or related to the object.
+    """
+    # only ``ModelResource`` classes (and instances) have a compiled plan
+    if resource is None or getattr(resource, '_plan', None) is None:
+        resource, created = get_resource_for_model(obj.__class__, fields=fields)
+
+    cache = resource._representation_cache
+
+    # unsaved objects cannot be cached. deep copies are returned and stored
+    # so the cached representation, including nested objects, is not changed
+    # by the caller
+    if cache is not None and obj.pk is not None:
+        new_obj = cache.get(obj)
+        if new_obj is not None:
+            return _copy_resolved(new_obj)
+    else:
+        cache = None
+
+    new_obj = {}
+
+    # run the accessors compiled for this resource, see ``compile_field_plan``
+    for accessor in resource._plan:
+        new_obj[accessor.key] = accessor.resolve(obj, resource)
 
-        new_obj[key] = convert_to_resource(value, fields=fields)
+    if cache is not None:
+        cache.set(obj, _copy_resolved(new_obj))
 
     return new_obj
 
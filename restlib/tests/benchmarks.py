@@ -0,0 +1,423 @@
+"""
+Benchmarks for the performance sensitive parts of restlib. These are not part
+of the test suite and must be run directly against the test settings:
+
+    DJANGO_SETTINGS_MODULE=restlib.tests.settings python -m restlib.tests.benchmarks
+
+A subset can be run by passing the names of the benchmarks as arguments.
+"""
+import sys
+import time
+from datetime import date
+
+from django.http import HttpRequest, HttpResponse
+from django.test.simple import DjangoTestSuiteRunner
+from django.utils import simplejson
+from django.utils.importlib import import_module
+
+from restlib import http
+from restlib.tests import models
+from restlib.resources.model import get_or_create_resource
+from restlib.resources.utils import convert_to_resource, objects_to_resource
+from restlib.representations import _json
+
+benchmarks = []
+
+def benchmark(func):
+    benchmarks.append(func)
+    return func
+
+def timeit(func, number=5):
+    "Returns the best time in seconds of ``number`` runs of ``func``."
+    best = None
+    for i in xrange(number):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def report(name, baseline, timings):
+    print name
+    print '    %-24s %8.2f ms' % ('baseline', baseline * 1000)
+    for label, elapsed in timings:
+        print '    %-24s %8.2f ms  (%.2fx)' % (label, elapsed * 1000,
+            baseline / elapsed)
+
+def populate(count=2000):
+    "Creates ``count`` books, one author per ten books and a few tags."
+    tags = [models.Tag.objects.create(name='tag%d' % i) for i in xrange(5)]
+
+    for i in xrange(count / 10):
+        hacker = models.Hacker.objects.create(name='Hacker %d' % i,
+            website='http://example.com/%d' % i)
+        hacker.tags.add(tags[i % len(tags)])
+
+        for j in xrange(10):
+            book = models.Book.objects.create(title='Book %d' % (i * 10 + j),
+                author=hacker, pub_date=date(2011, 1 + j, 1))
+            book.tags.add(tags[j % len(tags)])
+
+
+def interpretive_model_to_resource(obj, resource):
+    "The per-object field interpretation restlib used prior to field plans."
+    new_obj = {}
+
+    for field in resource.fields:
+        fields = None
+
+        if type(field) is tuple:
+            fields = field[1:]
+            field = field[0]
+
+        key = field
+        if '->' in field:
+            field, key = field.split('->')
+
+        if field in resource.exclude:
+            continue
+
+        if hasattr(obj, field):
+            value = getattr(obj, field)
+        else:
+            value = getattr(resource, field)(obj)
+
+        if callable(value):
+            value = value()
+        elif value.__class__.__name__ in ('RelatedManager', 'ManyRelatedManager'):
+            value = value.all()
+
+        new_obj[key] = convert_to_resource(value, fields=fields)
+
+    return new_obj
+
+
+@benchmark
+def field_plan():
+    resource, created = get_or_create_resource(models.Book, force=True,
+        fields=('id', 'title->name', 'pub_date', 'slug'), exclude=('id',),
+        slug=classmethod(lambda cls, obj: obj.title.lower()))
+
+    books = list(models.Book.objects.all())
+
+    baseline = timeit(lambda: [interpretive_model_to_resource(x, resource)
+        for x in books])
+    compiled = timeit(lambda: objects_to_resource(books, models.Book,
+        resource=resource))
+
+    report('field plan (%d books)' % len(books), baseline, [
+        ('compiled', compiled),
+    ])
+
+
+@benchmark
+def values_list():
+    resource, created = get_or_create_resource(models.Book, force=True,
+        fields=('id', 'title', 'pub_date'))
+
+    queryset = models.Book.objects.all()
+
+    baseline = timeit(lambda: resource.resolve_fields(list(queryset.all())))
+    values = timeit(lambda: resource.resolve_fields(queryset.all()))
+
+    report('values_list (%d books)' % queryset.count(), baseline, [
+        ('values_list', values),
+    ])
+
+
+@benchmark
+def json_backends():
+    resource, created = get_or_create_resource(models.Book, force=True,
+        fields=('id', 'title', 'pub_date', ('author', 'name', 'website'),
+        ('tags', 'name')))
+
+    data = resource.resolve_fields(models.Book.objects.all())
+
+    # an encoder was previously created for each call using the bundled
+    # simplejson
+    encoder_class = type('JSONEncoder', (_json.JSONEncoderMixin,
+        simplejson.JSONEncoder), {})
+
+    baseline = timeit(lambda: encoder_class().encode(data))
+    timings = []
+
+    for name in _json.BACKENDS:
+        try:
+            backend = import_module(name)
+        except ImportError:
+            continue
+
+        jsonrep = _json.JSON()
+        jsonrep.encoder_class = _json.get_encoder_class(backend)
+        jsonrep.backend_options = _json.get_backend_options(backend)
+
+        timings.append((name, timeit(lambda: jsonrep.encode(data, {}))))
+
+    report('json backends (%d books)' % len(data), baseline, timings)
+
+    # encoding each object separately, e.g. when streaming, is dominated by
+    # the creation of the encoder
+    jsonrep = _json.JSON()
+    baseline = timeit(lambda: [encoder_class().encode(x) for x in data])
+    cached = timeit(lambda: [jsonrep.encode(x, {}) for x in data])
+
+    report('json per object (%d books)' % len(data), baseline, [
+        ('cached encoder', cached),
+    ])
+
+
+class LegacyJSONEncoder(simplejson.JSONEncoder):
+    "The ``isinstance`` chain used prior to the type registry."
+    def default(self, obj):
+        if isinstance(obj, set):
+            return list(obj)
+        if isinstance(obj, _json.Decimal):
+            return float(str(obj))
+        if isinstance(obj, _json.datetime):
+            return obj.strftime('%s %s' % (_json.DATE_FORMAT, _json.TIME_FORMAT))
+        if isinstance(obj, _json.date):
+            return obj.strftime(_json.DATE_FORMAT)
+        if isinstance(obj, _json.time):
+            return obj.strftime(_json.TIME_FORMAT)
+        return super(LegacyJSONEncoder, self).default(obj)
+
+
+@benchmark
+def json_dates():
+    resource, created = get_or_create_resource(models.Book, force=True,
+        fields=('id', 'title', 'pub_date'))
+
+    data = resource.resolve_fields(models.Book.objects.all())
+
+    jsonrep = _json.JSON()
+    baseline = timeit(lambda: LegacyJSONEncoder().encode(data))
+    registry = timeit(lambda: jsonrep.encode(data, {}))
+
+    report('json dates (%d books)' % len(data), baseline, [
+        ('type registry', registry),
+    ])
+
+
+@benchmark
+def xml_decode():
+    from xml.etree import cElementTree as ET
+    from restlib.representations import _xml
+
+    resource, created = get_or_create_resource(models.Book, force=True,
+        fields=('id', 'title', 'pub_date', ('tags', 'name')))
+
+    rep = _xml.DataOrientedXML()
+    text = rep.encode({'book': resource.resolve_fields(models.Book.objects.all())})
+    converters = {'book/id': int, 'book/tags/name': unicode}
+
+    baseline = timeit(lambda: rep._decode(ET.XML(text), converters))
+    iterparse = timeit(lambda: rep.decode(text, converters))
+
+    report('xml decode (%d bytes)' % len(text), baseline, [
+        ('iterparse', iterparse),
+    ])
+
+
+@benchmark
+def msgpack():
+    from restlib.representations import _json, _msgpack
+
+    resource, created = get_or_create_resource(models.Book, force=True,
+        fields=('id', 'title', 'pub_date', ('author', 'name', 'website'),
+        ('tags', 'id', 'name')))
+
+    data = resource.resolve_fields(models.Book.objects.all())
+    numbers = [[i, i * 1000, i * 0.5] for i in xrange(len(data) * 10)]
+
+    jsonrep = _json.JSON()
+    rep = _msgpack.MessagePack()
+    packer = _msgpack.Packer(default=_msgpack._default)
+
+    for name, value in (('books', data), ('numbers', numbers)):
+        text = jsonrep.encode(value, {})
+        binary = rep.encode(value)
+
+        print 'msgpack size (%s): %d bytes, json: %d bytes (%.2fx)' % (name,
+            len(binary), len(text), float(len(text)) / len(binary))
+
+        baseline = timeit(lambda: jsonrep.encode(value, {}))
+        timings = [('%s encode' % _msgpack.backend, timeit(lambda: rep.encode(value)))]
+        if _msgpack.backend != 'restlib':
+            timings.append(('restlib encode', timeit(lambda: packer.pack(value))))
+
+        report('json encode vs. msgpack (%s)' % name, baseline, timings)
+
+        baseline = timeit(lambda: jsonrep.decode(text, {}))
+        timings = [('%s decode' % _msgpack.backend, timeit(lambda: rep.decode(binary)))]
+        if _msgpack.backend != 'restlib':
+            timings.append(('restlib decode',
+                timeit(lambda: _msgpack.unpackb(binary))))
+
+        report('json decode vs. msgpack (%s)' % name, baseline, timings)
+
+
+class LegacyDispatchMixin(object):
+    "The middleware dispatch prior to the precompiled chains."
+    def __call__(self, request, *args, **kwargs):
+        method = request.method
+
+        request.resource_args = args
+        request.resource_kwargs = kwargs
+
+        _response = self._process_middleware(request, 'process_request')
+        if _response is not None:
+            return _response
+
+        try:
+            output = getattr(self, method)(request, *args, **kwargs)
+        except http.HttpStatusCode, e:
+            output = e
+
+        response = self._get_response(request, output)
+
+        _response = self._process_middleware(request, 'process_response',
+            response=response)
+        if _response is not None:
+            return _response
+
+        return response
+
+    def _process_middleware(self, request, name, **kwargs):
+        method = request.method
+
+        if method in self._middleware:
+            procs = self._middleware[method]
+        else:
+            procs = self._middleware['__all__']
+
+        if procs.has_key(name):
+            for proc in procs[name]:
+                mw_cls = proc.__self__
+
+                try:
+                    output = proc(resource=self, request=request, **kwargs)
+                except http.HttpStatusCode, e:
+                    output = e
+
+                if output is not None:
+                    if isinstance(output, HttpResponse):
+                        return output
+
+                    if hasattr(mw_cls, 'get_response'):
+                        return mw_cls.get_response(message=output,
+                            resource=self, request=request)
+
+                    if not isinstance(output, http.HttpStatusCode):
+                        output = (http.responses[mw_cls.status_code], output)
+
+                    return self._get_response(request, output)
+
+
+@benchmark
+def middleware():
+    from restlib import resources
+
+    class TagResource(resources.Resource):
+        def GET(self, request):
+            return http.OK
+
+    class LegacyTagResource(LegacyDispatchMixin, TagResource):
+        pass
+
+    resource = TagResource()
+    legacy = LegacyTagResource()
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.META['HTTP_ACCEPT'] = 'application/json'
+
+    number = 10000
+
+    def run(resource):
+        for i in xrange(number):
+            resource(request)
+
+    baseline = timeit(lambda: run(legacy))
+    compiled = timeit(lambda: run(resource))
+
+    report('middleware dispatch (%d requests, default middleware)' % number,
+        baseline, [
+        ('precompiled chain', compiled),
+    ])
+
+    # the overhead of the dispatch itself is isolated using processors which
+    # do nothing
+    class NoopMiddleware(object):
+        status_code = 400
+
+        def process_request(self, resource, request, **kwargs):
+            pass
+
+        def process_response(self, resource, request, response, **kwargs):
+            pass
+
+    class NoopTagResource(resources.Resource):
+        middleware = (NoopMiddleware,) * 10
+
+        def GET(self, request):
+            return HttpResponse()
+
+    class LegacyNoopTagResource(LegacyDispatchMixin, NoopTagResource):
+        pass
+
+    baseline = timeit(lambda: run(LegacyNoopTagResource()))
+    compiled = timeit(lambda: run(NoopTagResource()))
+
+    report('middleware dispatch (%d requests, 20 no-op processors)' % number,
+        baseline, [
+        ('precompiled chain', compiled),
+    ])
+
+
+@benchmark
+def timing():
+    from restlib import resources
+
+    class TagResource(resources.Resource):
+        def GET(self, request):
+            return {'name': 'Python'}
+
+    class TimedTagResource(TagResource):
+        timing = True
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.META['HTTP_ACCEPT'] = 'application/json'
+
+    number = 10000
+
+    def run(resource):
+        for i in xrange(number):
+            resource(request)
+
+    baseline = timeit(lambda: run(TagResource()))
+    timed = timeit(lambda: run(TimedTagResource()))
+
+    report('phase timing (%d requests)' % number, baseline, [
+        ('timed', timed),
+    ])
+
+
+def main(names=None):
+    runner = DjangoTestSuiteRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+
+    try:
+        populate()
+        for func in benchmarks:
+            if not names or func.__name__ in names:
+                func()
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
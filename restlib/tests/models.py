@@ -24,3 +24,21 @@ class Book(models.Model):
     pub_date = models.DateField(null=True)
     tags = models.ManyToManyField(Tag)
 
+
+
+class CommaSeparatedField(models.CharField):
+    __metaclass__ = models.SubfieldBase
+
+    def to_python(self, value):
+        if isinstance(value, basestring):
+            return value and value.split(',') or []
+        return value
+
+    def get_prep_value(self, value):
+        return ','.join(value)
+
+
+class Document(models.Model):
+    title = models.CharField(max_length=50)
+    file = models.FileField(upload_to='documents')
+    keywords = CommaSeparatedField(max_length=100)
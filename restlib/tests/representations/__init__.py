@@ -1 +1,5 @@
 from json import *
+from xml import *
+from ndjson import *
+from csv import *
+from msgpack import *
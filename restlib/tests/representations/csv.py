@@ -0,0 +1,60 @@
+from __future__ import absolute_import
+
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from restlib.representations import _csv as csv
+
+__all__ = ('CSVRepresentationTestCase',)
+
+class CSVRepresentationTestCase(TestCase):
+    def setUp(self):
+        self.records = [
+            {'title': 'Ninja', 'pub_date': date(2011, 1, 1), 'price': Decimal('9.5')},
+            {'title': u'caf\xe9, "deux"', 'tags': [{'name': 'js'}]},
+            {'title': None, 'pub_date': None},
+        ]
+
+    def test_encode(self):
+        rep = csv.CSV()
+
+        self.assertEqual(rep.encode(self.records, columns=('title', 'pub_date')),
+            'title,pub_date\r\n'
+            'Ninja,01/01/2011\r\n'
+            '"caf\xc3\xa9, ""deux""",\r\n'
+            ',\r\n')
+
+        # the columns default to the keys of the first record
+        self.assertEqual(rep.encode(self.records[:1]),
+            'price,pub_date,title\r\n9.5,01/01/2011,Ninja\r\n')
+
+        # nested objects are encoded as JSON
+        self.assertEqual(rep.encode({'tags': [{'name': 'js'}]}),
+            'tags\r\n"[{""name"": ""js""}]"\r\n')
+
+    def test_empty(self):
+        rep = csv.CSV()
+
+        self.assertEqual(rep.encode([]), '')
+        self.assertEqual(rep.encode([], columns=('title',)), 'title\r\n')
+
+    def test_messages(self):
+        rep = csv.CSV()
+
+        # content which is not a sequence of records is a single cell
+        self.assertEqual(rep.encode('"bogus" is not a valid field',
+            columns=('title',)), '"""bogus"" is not a valid field"\r\n')
+        self.assertEqual(rep.encode(5, columns=('title',)), '5\r\n')
+        self.assertEqual(rep.encode([1, {'title': 'Ninja'}], columns=('title',)),
+            '1\r\ntitle\r\nNinja\r\n')
+
+    def test_encode_iter(self):
+        rep = csv.CSV()
+        rep.chunk_size = 10
+
+        chunks = list(rep.encode_iter(iter(self.records), columns=('title',)))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(''.join(chunks), rep.encode(self.records,
+            columns=('title',)))
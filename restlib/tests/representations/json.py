@@ -1,5 +1,8 @@
 from decimal import Decimal
+from datetime import datetime, date, time
+
 from django.test import TestCase
+from django.utils.importlib import import_module
 
 from restlib.representations import _json as json
 
@@ -25,8 +28,102 @@ class JSONRepresentationTestCase(TestCase):
         for x, y in self.tests + tests:
             self.assertEqual(jsonrep.encode(y, {}), x)
 
+    def test_encode_iter(self):
+        jsonrep = json.JSON()
+
+        for x, y in self.tests:
+            if type(y) is list:
+                self.assertEqual(''.join(jsonrep.encode_iter(iter(y), {})), x)
+
+        self.assertEqual(''.join(jsonrep.encode_iter(iter([]), {})), '[]')
+
+        # small chunks are yielded per item
+        jsonrep.chunk_size = 1
+        self.assertEqual(list(jsonrep.encode_iter(iter([1, {'a': 2}]), {})),
+            ['[1', ', {"a": 2}', ']'])
+
     def test_decode(self):
         jsonrep = json.JSON()
 
         for x, y in self.tests:
             self.assertEqual(jsonrep.decode(x, {}), y)
+
+    def test_cached(self):
+        jsonrep = json.JSON()
+
+        self.assertTrue(jsonrep.get_encoder({}) is jsonrep.get_encoder({}))
+        self.assertTrue(jsonrep.get_decoder({}) is jsonrep.get_decoder({}))
+        self.assertFalse(jsonrep.get_encoder({}) is
+            jsonrep.get_encoder({'sort_keys': True}))
+
+    def test_backends(self):
+        data = [{
+            'decimal': Decimal('1'),
+            'datetime': datetime(2011, 6, 1, 12, 30),
+            'date': date(2011, 6, 1),
+            'time': time(12, 30, 15),
+            'text': u'caf\xe9 "quoted"',
+            'nested': [1.5, None, True, {'a': 2}],
+        }]
+
+        expected = {}
+
+        # every available backend produces the same output
+        for name in json.BACKENDS:
+            try:
+                backend = import_module(name)
+            except ImportError:
+                continue
+
+            jsonrep = json.JSON()
+            jsonrep.encoder_class = json.get_encoder_class(backend)
+            jsonrep.backend_options = json.get_backend_options(backend)
+
+            for options in ({}, {'indent': 4, 'sort_keys': True}):
+                output = jsonrep.encode(data, options)
+                expected.setdefault(repr(options), output)
+                self.assertEqual(output, expected[repr(options)])
+
+        self.assertTrue('"date": "06/01/2011"' in expected['{}'])
+        self.assertTrue('"decimal": 1.0' in expected['{}'])
+
+    def test_types(self):
+        jsonrep = json.JSON()
+
+        class Date(date):
+            pass
+
+        self.assertEqual(jsonrep.encode(set([1]), {}), '[1]')
+        self.assertEqual(jsonrep.encode(frozenset([1]), {}), '[1]')
+        self.assertEqual(jsonrep.encode(Date(2011, 6, 1), {}), '"06/01/2011"')
+
+        # the formatting is that of the formats used previously
+        for value in (datetime(2011, 12, 31, 23, 59, 59, 999), date(1999, 1, 2),
+            time(0, 0, 1)):
+            if isinstance(value, datetime):
+                format = '%s %s' % (json.DATE_FORMAT, json.TIME_FORMAT)
+            elif isinstance(value, date):
+                format = json.DATE_FORMAT
+            else:
+                format = json.TIME_FORMAT
+
+            self.assertEqual(jsonrep.encode(value, {}),
+                '"%s"' % value.strftime(format))
+
+    def test_register_type(self):
+        jsonrep = json.JSON()
+
+        class Point(object):
+            def __init__(self, x, y):
+                self.x, self.y = x, y
+
+        self.assertRaises(TypeError, jsonrep.encode, Point(1, 2), {})
+
+        json.register_type(Point, lambda obj: [obj.x, obj.y])
+
+        try:
+            self.assertEqual(jsonrep.encode({'point': Point(1, 2)}, {}),
+                '{"point": [1, 2]}')
+        finally:
+            del json.type_encoders[Point]
+            json._type_encoder_cache.clear()
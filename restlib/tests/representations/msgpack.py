@@ -0,0 +1,102 @@
+from __future__ import absolute_import
+
+from decimal import Decimal
+from datetime import datetime, date, time
+
+from django.http import HttpRequest
+from django.test import TestCase
+from django.utils.safestring import mark_safe
+
+from restlib import http, resources
+from restlib.representations import _msgpack as msgpack
+
+__all__ = ('MessagePackRepresentationTestCase',)
+
+class MessagePackRepresentationTestCase(TestCase):
+    def setUp(self):
+        self.tests = (
+            None, True, False, 0, 127, 128, 65536, 2 ** 64 - 1, -1, -33,
+            -2 ** 63, 1.5, '', 'a' * 32, u'caf\xe9' * 100, [], range(20),
+            {'foo': [1, {'bar': None}]},
+            dict([(str(i), i) for i in xrange(20)]),
+        )
+
+    def _unicode(self, obj):
+        if isinstance(obj, str):
+            return obj.decode('utf-8')
+        if isinstance(obj, list):
+            return [self._unicode(x) for x in obj]
+        if isinstance(obj, dict):
+            return dict([(self._unicode(k), self._unicode(v))
+                for k, v in obj.iteritems()])
+        return obj
+
+    def test_encode(self):
+        rep = msgpack.MessagePack()
+
+        self.assertEqual(rep.encode({'a': [1, -1, None]}), '\x81\xa1a\x93\x01\xff\xc0')
+        self.assertEqual(rep.encode(mark_safe(u'caf\xe9')), '\xa5caf\xc3\xa9')
+
+        # the pure-Python implementation produces the same output as the
+        # library, if installed
+        packer = msgpack.Packer(default=msgpack._default)
+        for data in self.tests:
+            self.assertEqual(packer.pack(data), rep.encode(data))
+
+    def test_decode(self):
+        rep = msgpack.MessagePack()
+
+        for data in self.tests:
+            self.assertEqual(rep.decode(rep.encode(data)), self._unicode(data))
+            self.assertEqual(msgpack.unpackb(rep.encode(data)),
+                self._unicode(data))
+
+        for data in ('', '\xc1', '\x92\x01', '\xa3ab', '\x01\x02'):
+            self.assertRaises(ValueError, msgpack.unpackb, data)
+
+    def test_types(self):
+        rep = msgpack.MessagePack()
+
+        data = {
+            'set': set([1]),
+            'decimal': Decimal('1.5'),
+            'datetime': datetime(2011, 1, 2, 3, 4, 5),
+            'date': date(2011, 1, 2),
+            'time': time(3, 4, 5),
+        }
+
+        # the types are converted as they are for JSON
+        self.assertEqual(rep.decode(rep.encode(data)), {
+            'set': [1],
+            'decimal': 1.5,
+            'datetime': '01/02/2011 03:04:05',
+            'date': '01/02/2011',
+            'time': '03:04:05',
+        })
+
+        self.assertRaises(TypeError, rep.encode, object())
+
+    def test_resource(self):
+        class EchoResource(resources.Resource):
+            mimetypes = ('application/json', 'application/x-msgpack')
+
+            def POST(self, request):
+                return http.OK, request.data
+
+        rep = msgpack.MessagePack()
+        data = {'name': 'John Doe', 'tags': ['a', 'b'], 'age': 37}
+
+        request = HttpRequest()
+        request.method = 'POST'
+        request.META['CONTENT_TYPE'] = 'application/x-msgpack'
+        request.META['HTTP_ACCEPT'] = 'application/x-msgpack'
+        request._raw_post_data = rep.encode(data)
+
+        response = EchoResource(request)
+        self.assertEqual(response.status_code, http.OK)
+        self.assertEqual(response['Content-Type'], 'application/x-msgpack')
+        self.assertEqual(rep.decode(response.content), data)
+
+        request._raw_post_data = '\xc1'
+        response = EchoResource(request)
+        self.assertEqual(response.status_code, 422)
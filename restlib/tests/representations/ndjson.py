@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.test import TestCase
+
+from restlib.representations import _ndjson as ndjson
+
+__all__ = ('NDJSONRepresentationTestCase',)
+
+class NDJSONRepresentationTestCase(TestCase):
+    def setUp(self):
+        self.records = [
+            {'title': 'Ninja', 'pub_date': date(2011, 1, 1)},
+            {'title': u'caf\xe9', 'tags': [{'name': 'js'}]},
+            {'title': None},
+        ]
+
+    def test_encode(self):
+        rep = ndjson.NDJSON()
+
+        self.assertEqual(rep.encode(self.records), '{"pub_date": "01/01/2011", '
+            '"title": "Ninja"}\n{"tags": [{"name": "js"}], "title": '
+            '"caf\\u00e9"}\n{"title": null}\n')
+        self.assertEqual(rep.encode({'foo': 1}), '{"foo": 1}\n')
+        self.assertEqual(rep.encode([]), '')
+
+        # content which is not a sequence of records is a single line
+        self.assertEqual(rep.encode('Invalid cursor'), '"Invalid cursor"\n')
+        self.assertEqual(rep.encode(5), '5\n')
+
+    def test_encode_iter(self):
+        rep = ndjson.NDJSON()
+        rep.chunk_size = 10
+
+        chunks = list(rep.encode_iter(iter(self.records)))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(''.join(chunks), rep.encode(self.records))
+
+    def test_decode(self):
+        rep = ndjson.NDJSON()
+
+        self.assertEqual(rep.decode('{"a": 1}\n\n{"b": [2]}\n'),
+            [{'a': 1}, {'b': [2]}])
+        self.assertEqual(rep.decode(''), [])
@@ -0,0 +1,104 @@
+from __future__ import absolute_import
+
+from decimal import Decimal
+from xml.etree import cElementTree as ET
+
+from django.test import TestCase
+
+from restlib.representations import _xml as xml
+
+__all__ = ('XMLRepresentationTestCase',)
+
+class XMLRepresentationTestCase(TestCase):
+    def setUp(self):
+        self.tests = (
+            {'foo': 'bar'},
+            {'foo': None, 'bar': '', 'baz': {}, 'qux': []},
+            [{'book': {'title': 'Ninja', 'tags': [{'name': 'js'}, {'name': 'a & <b>'}]}}],
+            [1, 2.5, Decimal('3.0')],
+            {'mixed': [1, {'a': 1}, 2, [{'b': 2}, 3]]},
+            [],
+            'text',
+        )
+
+    def _tostring(self, data):
+        # the output of the ``ElementTree`` based encoder
+        rep = xml.DataOrientedXML()
+        return ET.tostring(rep._encode(data, ET.Element('root')), 'utf-8')
+
+    def test_encode(self):
+        rep = xml.DataOrientedXML()
+
+        for data in self.tests:
+            self.assertEqual(rep.encode(data), self._tostring(data))
+
+        self.assertEqual(rep.encode({'name': u'caf\xe9'}),
+            '<root><name>caf\xc3\xa9</name></root>')
+
+    def test_encode_iter(self):
+        rep = xml.DataOrientedXML()
+
+        items = [{'id': i, 'name': 'item %d' % i} for i in xrange(10)]
+
+        mixed = ([{}, 1, 2], [{'a': 1}, 2], items + [3, {'b': 2}],
+            [{'a': 1}, [{'b': 2}, 3]])
+
+        for data in (items, [], [{}], [{}] + items) + mixed:
+            self.assertEqual(''.join(rep.encode_iter(iter(data))),
+                self._tostring(data))
+            self.assertEqual(rep.encode(data), self._tostring(data))
+
+        # the text of the root cannot be written once a chunk is yielded
+        rep.chunk_size = 1
+        self.assertRaises(ValueError, list, rep.encode_iter(iter([{'a': 1}, 2])))
+
+        # small chunks are yielded per item
+        rep.chunk_size = 1
+        self.assertEqual(list(rep.encode_iter(iter([{'a': 1}, {'b': 2}]))),
+            ['<root><a>1</a>', '<b>2</b>', '</root>'])
+
+    def test_decode(self):
+        rep = xml.DataOrientedXML()
+
+        tests = (
+            '<root>text</root>',
+            '<root> </root>',
+            '<root id="1">text</root>',
+            '<root><a>1</a><b x="y" /><a>2</a><a>3</a></root>',
+            '<root><book><title>Ninja</title><pub_date>2011</pub_date>'
+                '<tags><tag>js</tag><tag>web</tag></tags></book>'
+                '<book><title>Python</title><pub_date>2010</pub_date></book></root>',
+            '<root ignored="1"><a><b><c>deep</c></b></a>text</root>',
+        )
+
+        converters = {
+            'a': int,
+            'book/pub_date': int,
+            'book/tags/tag': str.upper,
+            'a/b/c': len,
+        }
+
+        for text in tests:
+            for conv in ({}, converters):
+                self.assertEqual(rep.decode(text, conv),
+                    rep._decode(ET.XML(text), conv))
+
+        self.assertEqual(rep.decode('<root>1</root>', {'': int}), 1)
+        self.assertEqual(rep.decode(tests[4], converters)['book'][0], {
+            'title': 'Ninja',
+            'pub_date': 2011,
+            'tags': {'tag': ['JS', 'WEB']},
+        })
+
+    def test_decode_limits(self):
+        rep = xml.DataOrientedXML()
+        rep.max_depth = 3
+
+        self.assertEqual(rep.decode('<a><b><c>1</c></b></a>'), {'b': {'c': '1'}})
+        self.assertRaises(ValueError, rep.decode, '<a><b><c><d /></c></b></a>')
+
+        # the depth is checked before the rest of the document is parsed
+        self.assertRaises(ValueError, rep.decode, '<a><b><c><d>' * 1000)
+
+        rep.max_size = 10
+        self.assertRaises(ValueError, rep.decode, '<a>%s</a>' % ('x' * 10))
@@ -4,3 +4,8 @@ from collection import *
 from modelcollection import *
 from resolver import *
 from http_exceptions import *
+from cache import *
+from fieldsets import *
+from conditional import *
+from timing import *
+from metrics import *
@@ -0,0 +1,128 @@
+import time
+
+from django.core import exceptions
+
+from restlib import resources
+from restlib.resources import cache
+from restlib.tests import utils
+from restlib.tests import models
+
+
+__all__ = ('LRUBackendTestCase', 'RepresentationCacheTestCase')
+
+
+class LRUBackendTestCase(utils.BaseTestCase):
+    def test_eviction(self):
+        backend = cache.LRUBackend(max_size=2)
+
+        backend.set('a', 1)
+        backend.set('b', 2)
+        self.assertEqual(backend.get('a'), 1)
+
+        # 'b' is now the least recently used
+        backend.set('c', 3)
+        self.assertEqual(backend.get('b'), None)
+        self.assertEqual(backend.get('a'), 1)
+        self.assertEqual(backend.get('c'), 3)
+
+    def test_generation(self):
+        backend = cache.LRUBackend(max_size=1)
+
+        generation = backend.get_generation('g')
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.incr_generation('g')
+
+        self.assertEqual(backend.get_generation('g'), generation + 1)
+
+        # generations are not restarted by new backends, e.g. after a restart
+        # or in another process
+        time.sleep(0.01)
+        self.assertTrue(cache.LRUBackend().get_generation('g') > generation + 1)
+
+    def test_get_backend(self):
+        backend = cache.get_backend('restlib.resources.cache.LRUBackend')
+        self.assertTrue(isinstance(backend, cache.LRUBackend))
+        self.assertTrue(cache.get_backend('restlib.resources.cache.LRUBackend') is backend)
+
+        for path in ('LRUBackend', 'restlib.bogus.LRUBackend',
+            'restlib.resources.cache.Bogus'):
+            self.assertRaises(exceptions.ImproperlyConfigured,
+                cache.get_backend, path)
+
+
+class RepresentationCacheTestCase(utils.BaseTestCase):
+    def setUp(self):
+        super(RepresentationCacheTestCase, self).setUp()
+
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('title', ('author', 'name'), ('tags', 'name'))
+            representation_cache = cache.LRUBackend(max_size=10)
+
+        self.resource = BookResource
+        self.cache = BookResource._representation_cache
+
+    def test_hit(self):
+        expected = {
+            'title': 'Secrets of a JavaScript Ninja',
+            'author': {'name': 'John Resig'},
+            'tags': [{'name': 'javascript'}],
+        }
+
+        self.assertEqual(self.resource.resolve_fields(self.book), expected)
+        self.assertNumQueries(0, self.resource.resolve_fields, self.book)
+
+        output = self.resource.resolve_fields(self.book)
+        self.assertEqual(output, expected)
+
+        # changes to the output do not affect the cache
+        output['title'] = None
+        self.assertEqual(self.resource.resolve_fields(self.book), expected)
+
+        # nor do changes to nested objects, either of the stored output or
+        # of the output read from the cache
+        output = self.resource.resolve_fields(self.book)
+        output['tags'].append('INJECTED')
+        output['author']['name'] = None
+        self.assertEqual(self.resource.resolve_fields(self.book), expected)
+
+        self.assertEqual(self.cache.stats(), {
+            'hits': 5,
+            'misses': 1,
+            'hit_ratio': 5 / 6.0,
+        })
+
+        # the output of a miss is not the stored representation either
+        self.cache.invalidate()
+        output = self.resource.resolve_fields(self.book)
+        output['tags'][0]['name'] = 'INJECTED'
+        self.assertEqual(self.resource.resolve_fields(self.book), expected)
+
+    def test_object_changed(self):
+        self.resource.resolve_fields(self.book)
+
+        self.book.title = 'Pro JavaScript Techniques'
+        self.book.save()
+
+        output = self.resource.resolve_fields(self.book)
+        self.assertEqual(output['title'], 'Pro JavaScript Techniques')
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_dependency_changed(self):
+        self.resource.resolve_fields(self.book)
+
+        self.jresig.name = 'jeresig'
+        self.jresig.save()
+
+        self.book = models.Book.objects.get(pk=self.book.pk)
+        output = self.resource.resolve_fields(self.book)
+        self.assertEqual(output['author'], {'name': 'jeresig'})
+
+        tag = models.Tag(name='ninja')
+        tag.save()
+        self.book.tags.add(tag)
+
+        output = self.resource.resolve_fields(self.book)
+        self.assertEqual(output['tags'], [{'name': 'javascript'}, {'name': 'ninja'}])
+        self.assertEqual(self.cache.misses, 3)
@@ -0,0 +1,166 @@
+import time
+from datetime import date
+
+from django.http import HttpRequest
+from django.utils.http import http_date
+
+from restlib import resources
+from restlib.resources import cache
+from restlib.tests import utils
+from restlib.tests import models
+
+
+__all__ = ('NotModifiedTestCase', 'GenerationTestCase')
+
+
+class NotModifiedTestCase(utils.BaseTestCase):
+    def setUp(self):
+        super(NotModifiedTestCase, self).setUp()
+
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('id', 'title')
+            timestamp_field = 'pub_date'
+
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+
+        self.resource = BookResource
+        self.collection = BookResourceCollection
+
+    def _get(self, resource, *args, **headers):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+        request.META.update(headers)
+        return resource(request, *args)
+
+    def test_object(self):
+        response = self._get(self.resource, self.book.pk)
+        self.assertEqual(response.status_code, 200)
+
+        # naive timestamps are in the local time zone
+        self.assertEqual(response['Last-Modified'],
+            http_date(time.mktime(self.book.pub_date.timetuple())))
+
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+
+        # only the validators are queried
+        self.assertNumQueries(1, self._get, self.resource, self.book.pk,
+            HTTP_IF_NONE_MATCH=etag)
+
+        response = self._get(self.resource, self.book.pk, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, '')
+
+        response = self._get(self.resource, self.book.pk,
+            HTTP_IF_MODIFIED_SINCE='Fri, 03 Jun 2011 00:00:00 GMT')
+        self.assertEqual(response.status_code, 304)
+
+        response = self._get(self.resource, self.book.pk,
+            HTTP_IF_MODIFIED_SINCE='Mon, 30 May 2011 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+        self.book.pub_date = date(2011, 7, 1)
+        self.book.save()
+
+        response = self._get(self.resource, self.book.pk, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # missing objects are handled as usual
+        response = self._get(self.resource, 0, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_collection(self):
+        etag = self._get(self.collection)['ETag']
+
+        self.assertNumQueries(1, self._get, self.collection,
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(self._get(self.collection,
+            HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # adding older objects does not change the timestamp, but the count
+        book = models.Book(title='Learning Python', author=self.jresig,
+            pub_date=date(2010, 1, 1))
+        book.save()
+        models.Book(title='Python Cookbook', author=self.jresig,
+            pub_date=date(2010, 1, 1)).save()
+
+        response = self._get(self.collection, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # replacing it changes neither the count nor the timestamp
+        etag = response['ETag']
+        book.delete()
+        models.Book(title='Programming Python', author=self.jresig,
+            pub_date=date(2010, 1, 1)).save()
+
+        response = self._get(self.collection, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class GenerationTestCase(utils.BaseTestCase):
+    def setUp(self):
+        super(GenerationTestCase, self).setUp()
+
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('id', 'title', ('author', 'name'), ('tags', 'name'))
+            generation_etags = True
+
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+
+        self.resource = BookResource
+        self.collection = BookResourceCollection
+
+    def _get(self, resource, *args, **headers):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+        request.META.update(headers)
+        return resource(request, *args)
+
+    def test_generations(self):
+        generation = cache.generations.get(models.Hacker)
+
+        self.jresig.save()
+        self.assertEqual(cache.generations.get(models.Hacker), generation + 1)
+
+        # deferred objects share the generation of the model
+        models.Hacker.objects.only('name').get(pk=self.jresig.pk).save()
+        self.assertEqual(cache.generations.get(models.Hacker), generation + 2)
+
+    def test_collection(self):
+        etag = self._get(self.collection)['ETag']
+
+        # no queries are required for the validators
+        self.assertNumQueries(0, self._get, self.collection,
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(self._get(self.collection,
+            HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # changes to related objects result in a new entity tag
+        tag = models.Tag.objects.create(name='python')
+
+        for change in (self.jresig.save, lambda: self.book.tags.add(tag)):
+            change()
+            response = self._get(self.collection, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+    def test_object(self):
+        etag = self._get(self.resource, self.book.pk)['ETag']
+
+        self.assertNumQueries(0, self._get, self.resource, self.book.pk,
+            HTTP_IF_NONE_MATCH=etag)
+
+        # each object has its own entity tag
+        book = models.Book.objects.create(title='Pro JavaScript Techniques',
+            author=self.jresig)
+        self.assertNotEqual(self._get(self.resource, book.pk)['ETag'], etag)
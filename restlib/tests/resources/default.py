@@ -1,3 +1,4 @@
+from django.conf import settings as django_settings
 from django.test import TestCase
 from django.http import HttpRequest, HttpResponse
 
@@ -32,6 +33,11 @@ class ResourceTestCase(TestCase):
             def PUT(self, request):
                 return 'Updated'
 
+        class E(resources.Resource):
+            def GET(self, request):
+                for tag in Tag.objects.all():
+                    yield tag
+
         class C(resources.Resource):
             middleware = (
                 'restlib.resources.middleware.client.MethodNotAllowed',
@@ -58,6 +64,7 @@ class ResourceTestCase(TestCase):
         self.b = B()
         self.c = C()
         self.d = D()
+        self.e = E()
 
     def test_allowed_methods(self):
         self.assertTrue(all([x in self.a.allowed_methods for x in ('OPTIONS',)]))
@@ -106,6 +113,92 @@ class ResourceTestCase(TestCase):
 
         request.method = 'HEAD'
         response = self.d(request)
+        self.assertEqual(response.content, '')
+
+    def test_no_middleware(self):
+        class F(resources.Resource):
+            middleware = ()
+
+            def GET(self, request):
+                return 'Hello World!'
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.accepttype = 'application/json'
+
+        self.assertEqual(F._middleware, {'GET': {}, 'HEAD': {}, 'OPTIONS': {},
+            '__all__': {}})
+
+        response = F(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, '"Hello World!"')
+
+    def test_stateless(self):
+        class F(resources.Resource):
+            stateless = True
+
+            def GET(self, request):
+                return id(self)
+
+        class G(F):
+            pass
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+
+        self.assertEqual(F(request).content, F(request).content)
+        self.assertNotEqual(F(request).content, G(request).content)
+
+    def test_stateless_guard(self):
+        debug = django_settings.DEBUG
+        django_settings.DEBUG = True
+
+        try:
+            class F(resources.Resource):
+                stateless = True
+
+                def __init__(self):
+                    self.count = 0
+
+                def GET(self, request):
+                    self.count += 1
+                    return self.count
+        finally:
+            django_settings.DEBUG = debug
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+
+        self.assertRaises(AttributeError, F, request)
+
+    def test_head_not_resolved(self):
+        class F(resources.Resource):
+            def GET(self, request):
+                return Tag.objects.all()
+
+        class G(F):
+            def get_head_headers(self, request, output):
+                return {'X-Count': output.count()}
+
+        request = HttpRequest()
+        request.method = 'HEAD'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+
+        # the queryset is never evaluated, nor encoded
+        self.assertNumQueries(0, F, request)
+
+        response = F(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, '')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        response = self.e(request)
+        self.assertFalse(getattr(response, 'streaming', False))
+
+        self.assertNumQueries(1, G, request)
+        self.assertEqual(G(request)['X-Count'], '2')
 
     def test_options(self):
         request = HttpRequest()
@@ -139,3 +232,12 @@ class ResourceTestCase(TestCase):
 
         response = self.b(request)
         self.assertEqual(response.content, '[{"id": 1}, {"id": 2}]')
+
+    def test_generator(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = '*/*'
+
+        response = self.e(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.content, '[{"id": 1}, {"id": 2}]')
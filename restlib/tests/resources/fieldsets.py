@@ -0,0 +1,120 @@
+from django.db import connection
+from django.http import HttpRequest
+
+from restlib import resources
+from restlib.tests import utils
+from restlib.tests import models
+
+
+__all__ = ('FieldsetTestCase',)
+
+
+class FieldsetTestCase(utils.BaseTestCase):
+    def setUp(self):
+        super(FieldsetTestCase, self).setUp()
+
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('id', 'title', 'pub_date', ('author', 'name', 'website'),
+                ('tags', 'id', 'name'))
+
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+
+        self.resource = BookResource
+        self.collection = BookResourceCollection
+
+    def test_parse(self):
+        parse = resources.utils.parse_fieldset
+
+        self.assertEqual(parse('title'), ('title',))
+        self.assertEqual(parse(' title, author (name) ,tags'),
+            ('title', ('author', 'name'), 'tags'))
+        self.assertEqual(parse('author(name,book_set(title,tags(name)))'),
+            (('author', 'name', ('book_set', 'title', ('tags', 'name'))),))
+
+        for text in ('author(name', 'author)', '(name)', 'author()'):
+            self.assertRaises(ValueError, parse, text)
+
+    def test_select(self):
+        fieldset = self.resource.get_fieldset('title,author(name)')
+
+        self.assertEqual(fieldset.resolve_fields(self.book), {
+            'title': 'Secrets of a JavaScript Ninja',
+            'author': {'name': 'John Resig'},
+        })
+        self.assertEqual(fieldset._only, ('title', 'author'))
+        self.assertEqual(fieldset._columns, None)
+
+        # fieldsets are only compiled once
+        self.assertTrue(self.resource.get_fieldset('title,author(name)') is fieldset)
+
+        for fields in ('isbn', 'title(name)', 'author(age)'):
+            self.assertRaises(ValueError, self.resource.get_fieldset, fields)
+
+    def test_only(self):
+        fieldset = self.collection.get_fieldset('title,tags(name)')
+        output = self.collection._resolve(models.Book.objects.all(), fieldset)
+
+        self.assertEqual(output, [{
+            'title': 'Secrets of a JavaScript Ninja',
+            'tags': [{'name': 'javascript'}],
+        }])
+
+        # only the selected columns of concrete fields are fetched
+        fieldset = self.collection.get_fieldset('id,title')
+        self.assertEqual(fieldset._columns, ('id', 'title'))
+
+    def test_nested_only(self):
+        class HackerResource(resources.ModelResource):
+            model = models.Hacker
+            fields = ('name', ('libraries', 'name', 'url'),
+                ('book_set', 'title', 'pub_date'))
+            default_for_related = False
+
+        class HackerResourceCollection(resources.ModelResourceCollection):
+            resource = HackerResource
+
+        fieldset = HackerResourceCollection.get_fieldset(
+            'name,libraries(name),book_set(title)')
+
+        connection.use_debug_cursor = True
+        del connection.queries[:]
+
+        try:
+            output = HackerResourceCollection._resolve(
+                models.Hacker.objects.all(), fieldset)
+            queries = [x['sql'] for x in connection.queries]
+        finally:
+            connection.use_debug_cursor = False
+
+        self.assertEqual(output, [{
+            'name': 'John Resig',
+            'libraries': [{'name': 'jQuery'}],
+            'book_set': [{'title': 'Secrets of a JavaScript Ninja'}],
+        }])
+
+        # the related objects are fetched with only the selected columns and
+        # the column used to group them
+        libraries = [x for x in queries if 'FROM "tests_library"' in x][0]
+        self.assertFalse('"url"' in libraries)
+        self.assertFalse('"language"' in libraries)
+
+        books = [x for x in queries if 'FROM "tests_book"' in x][0]
+        self.assertTrue('"author_id"' in books)
+        self.assertFalse('"pub_date"' in books)
+
+    def test_response(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+        request.GET['fields'] = 'title,author(name)'
+
+        response = self.collection(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, '[{"author": {"name": "John Resig"}, '
+            '"title": "Secrets of a JavaScript Ninja"}]')
+
+        request.GET['fields'] = 'title,isbn'
+        response = self.collection(request)
+        self.assertEqual(response.status_code, 400)
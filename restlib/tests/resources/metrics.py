@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+
+from django.http import HttpRequest
+from django.test import TestCase
+
+from restlib import resources
+from restlib.resources import metrics, timing
+from restlib.tests import models
+
+
+__all__ = ('MetricsStoreTestCase', 'MetricsTestCase')
+
+
+class MetricsStoreTestCase(TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_local(self):
+        store = metrics.LocalStore()
+        store.incr('a')
+        store.incr('a', 2.5)
+        store.set('b', 3)
+
+        self.assertEqual(store.collect(), {'a': 3.5, 'b': 3.0})
+
+    def test_file(self):
+        store = metrics.FileStore(self.path)
+        store.incr('a')
+        store.incr('a', 2.5)
+        store.set('b', 3)
+
+        self.assertEqual(store.collect(), {'a': 3.5, 'b': 3.0})
+
+        # the entries are read back when the file is reopened
+        store = metrics.FileStore(self.path)
+        store.incr('a')
+        self.assertEqual(store.collect(), {'a': 4.5, 'b': 3.0})
+
+    def test_grow(self):
+        store = metrics.FileStore(self.path)
+        keys = ['key-%d' % i for i in xrange(5000)]
+
+        for key in keys:
+            store.incr(key)
+
+        values = store.collect()
+        self.assertEqual(len(values), 5000)
+        self.assertEqual(sum(values.values()), 5000)
+
+    def test_processes(self):
+        store = metrics.FileStore(self.path)
+        store.incr('requests')
+
+        pid = os.fork()
+
+        # the child process writes to its own file
+        if pid == 0:
+            try:
+                store.incr('requests', 2)
+                store.incr('child')
+            finally:
+                os._exit(0)
+
+        os.waitpid(pid, 0)
+        store.incr('requests')
+
+        self.assertEqual(len(os.listdir(self.path)), 2)
+        self.assertEqual(store.collect(), {'requests': 4.0, 'child': 1.0})
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        class BookResource(resources.Resource):
+            timing = True
+
+            def GET(self, request):
+                return {'title': 'Ninja'}
+
+        self.resource = BookResource
+        self.name = '%s.BookResource' % BookResource.__module__
+
+        self.store = metrics.LocalStore()
+        self.sink = metrics.MetricsSink(store=self.store)
+
+        self._sinks = timing._sinks.copy()
+        timing._sinks[timing.settings.TIMING_SINK] = self.sink
+
+    def tearDown(self):
+        timing._sinks.clear()
+        timing._sinks.update(self._sinks)
+
+    def _request(self, accept='application/json'):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = accept
+        return request
+
+    def test_record(self):
+        self.resource(self._request())
+        self.resource(self._request())
+        self.resource(self._request('text/html'))
+
+        values = dict([(metrics._parse_key(k), v)
+            for k, v in self.store.collect().iteritems()])
+
+        self.assertEqual(values[('restlib_requests_total', (('method', 'GET'),
+            ('resource', self.name), ('status', '200')))], 2)
+        self.assertEqual(values[('restlib_requests_total', (('method', 'GET'),
+            ('resource', self.name), ('status', '406')))], 1)
+        self.assertEqual(values[('restlib_request_duration_seconds_count',
+            (('method', 'GET'), ('resource', self.name)))], 3)
+
+        # the 406 response contains the acceptable mimetypes
+        self.assertEqual(values[('restlib_response_bytes_total',
+            (('method', 'GET'), ('resource', self.name)))],
+            2 * len('{"title": "Ninja"}') + len('application/json'))
+
+    def test_render(self):
+        self.resource(self._request())
+
+        response = metrics.MetricsResource(self._request('text/plain'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+        lines = response.content.splitlines()
+        labels = 'method="GET",resource="%s"' % self.name
+
+        self.assertTrue('# TYPE restlib_requests_total counter' in lines)
+        self.assertTrue('restlib_requests_total{%s,status="200"} 1.0' % labels
+            in lines)
+        self.assertTrue('restlib_request_duration_seconds_bucket{%s,le="+Inf"} 1.0'
+            % labels in lines)
+        self.assertTrue('restlib_request_duration_seconds_count{%s} 1.0' % labels
+            in lines)
+
+    def test_cache(self):
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('id', 'title')
+            representation_cache = True
+            default_for_related = False
+
+        book = models.Book(title='Ninja', author=models.Hacker.objects.create(
+            name='John Resig', website='http://ejohn.org'))
+        book.save()
+
+        for i in xrange(3):
+            BookResource.resolve_fields(book)
+
+        values = self.store.collect()
+        name = '%s.BookResource' % BookResource.__module__
+
+        self.assertEqual(values[metrics._get_key(
+            'restlib_representation_cache_hits_total', {'resource': name})], 2)
+        self.assertEqual(values[metrics._get_key(
+            'restlib_representation_cache_misses_total', {'resource': name})], 1)
+
+        lines = metrics.render(values).splitlines()
+        self.assertTrue('restlib_representation_cache_hit_ratio{resource="%s"} %r'
+            % (name, 2 / 3.0) in lines)
+
+    def test_render_values(self):
+        store = metrics.LocalStore()
+        key = metrics._get_key
+
+        labels = {'resource': 'a.B', 'method': 'GET'}
+        store.incr(key('restlib_request_duration_seconds_bucket',
+            dict(labels, le='0.001')))
+        store.incr(key('restlib_request_duration_seconds_bucket',
+            dict(labels, le='0.1')), 2)
+        store.incr(key('restlib_request_duration_seconds_count', labels), 3)
+        store.set(key('restlib_representation_cache_hits_total',
+            {'resource': 'a"B'}), 3)
+        store.set(key('restlib_representation_cache_misses_total',
+            {'resource': 'a"B'}), 1)
+
+        lines = metrics.render(store.collect()).splitlines()
+
+        # the buckets are cumulative
+        prefix = 'restlib_request_duration_seconds_bucket{method="GET",resource="a.B",'
+        self.assertTrue(prefix + 'le="0.001"} 1.0' in lines)
+        self.assertTrue(prefix + 'le="0.05"} 1.0' in lines)
+        self.assertTrue(prefix + 'le="0.1"} 3.0' in lines)
+        self.assertTrue(prefix + 'le="+Inf"} 3.0' in lines)
+
+        self.assertTrue('restlib_representation_cache_hit_ratio{resource="a\\"B"} 0.75'
+            in lines)
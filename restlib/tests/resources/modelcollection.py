@@ -0,0 +1,364 @@
+import base64
+import inspect
+from datetime import date
+
+from django.http import HttpRequest
+from django.utils import simplejson
+
+from restlib import resources
+from restlib.tests import utils
+from restlib.tests import models
+
+
+__all__ = ('PrefetchTestCase', 'StreamingTestCase', 'PaginationTestCase',
+    'BatchTestCase')
+
+
+class CollectionTestCase(utils.BaseTestCase):
+    def setUp(self):
+        super(CollectionTestCase, self).setUp()
+
+        self.tag2 = models.Tag(name='python')
+        self.tag2.save()
+
+        for i in xrange(5):
+            hacker = models.Hacker(name='Hacker %d' % i, website='http://example.com')
+            hacker.save()
+
+            for j in xrange(3):
+                book = models.Book(title='Book %d' % j, author=hacker,
+                    pub_date=date(2011, 1, 1))
+                book.save()
+                book.tags.add(self.tag1)
+                if j % 2:
+                    book.tags.add(self.tag2)
+
+
+class PrefetchTestCase(CollectionTestCase):
+    def test_lookups(self):
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('title', ('author', 'name', ('book_set', 'title')),
+                ('tags', 'name'))
+
+        self.assertEqual(resources.utils.get_related_lookups(BookResource._plan),
+            (('author',), ('author__book_set', 'tags')))
+
+    def test_foreign_key_and_many_to_many(self):
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('title', ('author', 'name'), ('tags', 'name'))
+
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+
+        queryset = models.Book.objects.order_by('id')
+        expected = resources.utils.convert_to_resource(queryset,
+            resource=BookResource)
+
+        # the books (with their authors), the intermediate table and the tags
+        self.assertNumQueries(3, BookResourceCollection.resolve_fields,
+            queryset.all())
+
+        self.assertEqual(BookResourceCollection.resolve_fields(queryset.all()),
+            expected)
+        self.assertEqual(expected[-1], {
+            'title': 'Book 2',
+            'author': {'name': 'Hacker 4'},
+            'tags': [{'name': 'javascript'}],
+        })
+
+    def test_reverse_foreign_key(self):
+        class HackerResource(resources.ModelResource):
+            model = models.Hacker
+            fields = ('name', ('book_set', 'title', ('tags', 'name')))
+
+        class HackerResourceCollection(resources.ModelResourceCollection):
+            resource = HackerResource
+
+        queryset = models.Hacker.objects.order_by('id')
+        expected = resources.utils.convert_to_resource(queryset,
+            resource=HackerResource)
+
+        self.assertNumQueries(4, HackerResourceCollection.resolve_fields,
+            queryset.all())
+
+        self.assertEqual(HackerResourceCollection.resolve_fields(queryset.all()),
+            expected)
+        self.assertEqual(expected[0], {
+            'name': 'John Resig',
+            'book_set': [{
+                'title': 'Secrets of a JavaScript Ninja',
+                'tags': [{'name': 'javascript'}],
+            }],
+        })
+
+    def test_disabled(self):
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('title', ('author', 'name'))
+
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+            prefetch_related = False
+
+        queryset = models.Book.objects.all()
+
+        self.assertNumQueries(queryset.count() + 1,
+            BookResourceCollection.resolve_fields, queryset)
+
+
+class StreamingTestCase(CollectionTestCase):
+    def setUp(self):
+        super(StreamingTestCase, self).setUp()
+
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('title', 'pub_date', ('author', 'name'), ('tags', 'name'))
+
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+
+        class StreamingBookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+            streaming = True
+            chunk_size = 4
+
+        self.collection = BookResourceCollection
+        self.streaming = StreamingBookResourceCollection
+
+    def test_resolve(self):
+        queryset = models.Book.objects.order_by('id')
+
+        output = self.streaming.resolve_fields(queryset)
+        self.assertTrue(inspect.isgenerator(output))
+
+        # the books are read in 4 chunks, each of which prefetches the tags
+        self.assertNumQueries(1 + 4 * 2, list,
+            self.streaming.resolve_fields(queryset.all()))
+
+        self.assertEqual(list(output), self.collection.resolve_fields(queryset.all()))
+        self.assertEqual(queryset._result_cache, None)
+
+    def test_values_list(self):
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = resources.utils.get_resource_for_model(models.Book,
+                fields=('id', 'title'))[0]
+            streaming = True
+
+        queryset = models.Book.objects.order_by('id')
+        output = BookResourceCollection.resolve_fields(queryset)
+
+        self.assertEqual(list(output), list(queryset.values('id', 'title')))
+
+    def test_response(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+
+        response = self.streaming(request)
+        self.assertTrue(response.streaming)
+        self.assertTrue(request.streaming)
+
+        expected = self.collection(request).content
+        self.assertEqual(response.content, expected)
+
+    def test_records(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/x-ndjson'
+
+        response = self.streaming(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        lines = response.content.splitlines()
+        self.assertEqual(len(lines), 16)
+        self.assertEqual(simplejson.loads(lines[0]),
+            simplejson.loads(self.collection(request).content.splitlines()[0]))
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'text/csv'
+
+        response = self.streaming(request)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        # the columns are the fields of the resource
+        lines = response.content.splitlines()
+        self.assertEqual(len(lines), 17)
+        self.assertEqual(lines[0], 'title,pub_date,author,tags')
+        self.assertEqual(lines[1], 'Secrets of a JavaScript Ninja,06/01/2011,'
+            '"{""name"": ""John Resig""}","[{""name"": ""javascript""}]"')
+
+
+class PaginationTestCase(CollectionTestCase):
+    def setUp(self):
+        super(PaginationTestCase, self).setUp()
+
+        class BookResource(resources.ModelResource):
+            model = models.Book
+            fields = ('id', 'title')
+
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+            paginate_by = 4
+            max_page_size = 10
+
+        class StreamingBookResourceCollection(resources.ModelResourceCollection):
+            resource = BookResource
+            paginate_by = 4
+            streaming = True
+
+        self.collection = BookResourceCollection
+        self.streaming = StreamingBookResourceCollection
+
+    def _get(self, collection, accept='application/json', **params):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = '/books/'
+        request.META['HTTP_ACCEPT'] = accept
+        request.GET.update(params)
+        return collection(request)
+
+    def _get_links(self, response):
+        links = {}
+        for link in response.get('Link', '').split(', '):
+            if link:
+                url, rel = link.split('; ')
+                cursor = url[1:-1].split('cursor=')[1]
+                links[rel[5:-1]] = cursor
+        return links
+
+    def _get_ids(self, response):
+        return [x['id'] for x in simplejson.loads(response.content)]
+
+    def test_pages(self):
+        ids = list(models.Book.objects.order_by('pk').values_list('pk', flat=True))
+
+        response = self._get(self.collection)
+        self.assertEqual(self._get_ids(response), ids[:4])
+        self.assertEqual(self._get_links(response).keys(), ['next'])
+
+        # walk forward through all of the pages
+        pages = [ids[:4]]
+        cursor = self._get_links(response)['next']
+
+        while cursor:
+            response = self._get(self.collection, cursor=cursor)
+            pages.append(self._get_ids(response))
+            cursor = self._get_links(response).get('next')
+
+        self.assertEqual(pages, [ids[i:i + 4] for i in xrange(0, len(ids), 4)])
+
+        # and back from the last page
+        cursor = self._get_links(response)['prev']
+        response = self._get(self.collection, cursor=cursor)
+        self.assertEqual(self._get_ids(response), pages[-2])
+
+        links = self._get_links(response)
+        self.assertEqual(sorted(links.keys()), ['next', 'prev'])
+
+        response = self._get(self.collection, cursor=links['next'])
+        self.assertEqual(self._get_ids(response), pages[-1])
+
+    def test_constant_cost(self):
+        page = self.collection().paginate(HttpRequest(),
+            models.Book.objects.all())
+        request = HttpRequest()
+        request.GET['cursor'] = page.next
+
+        # the keys of the page and the page itself
+        self.assertNumQueries(2, lambda: list(self.collection()\
+            .paginate(request, models.Book.objects.all()).queryset))
+
+    def test_ordering(self):
+        class BookResourceCollection(resources.ModelResourceCollection):
+            resource = self.collection._resource_cls
+            paginate_by = 3
+            ordering = ('-title',)
+
+        expected = list(models.Book.objects.order_by('-title', 'pk')\
+            .values_list('pk', flat=True))
+
+        response = self._get(BookResourceCollection)
+        ids = self._get_ids(response)
+
+        while 'next' in self._get_links(response):
+            response = self._get(BookResourceCollection,
+                cursor=self._get_links(response)['next'])
+            ids.extend(self._get_ids(response))
+
+        self.assertEqual(ids, expected)
+
+    def test_limit(self):
+        self.assertEqual(len(self._get_ids(self._get(self.collection, limit='2'))), 2)
+        self.assertEqual(len(self._get_ids(self._get(self.collection, limit='50'))), 10)
+
+        self.assertEqual(self._get(self.collection, limit='0').status_code, 400)
+        self.assertEqual(self._get(self.collection, cursor='bogus').status_code, 400)
+
+        # well-formed cursors with invalid values
+        for values in (['n', 5], ['n', {}], ['n', [{}]]):
+            cursor = base64.urlsafe_b64encode(simplejson.dumps(values))
+            self.assertEqual(self._get(self.collection, cursor=cursor).status_code, 400)
+
+    def test_errors(self):
+        # error messages are encoded as a single cell or line
+        for accept, expected in (('text/csv', '%s\r\n'), ('application/x-ndjson', '"%s"\n')):
+            for collection in (self.collection, self.streaming):
+                response = self._get(collection, accept=accept, limit='abc')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.content, expected % 'The limit must be a positive integer')
+
+                response = self._get(collection, accept=accept, fields='bogus')
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue('bogus' in response.content)
+
+    def test_streaming(self):
+        response = self._get(self.streaming)
+        self.assertTrue(response.streaming)
+
+        cursor = self._get_links(response)['next']
+        expected = self._get(self.collection, cursor=cursor)
+        response = self._get(self.streaming, cursor=cursor)
+
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['Link'], expected['Link'])
+
+
+class BatchTestCase(CollectionTestCase):
+    def _test(self, model, fields, streaming=False):
+        resource = resources.utils.get_resource_for_model(model, fields)[0]
+
+        Collection = type('Collection', (resources.ModelResourceCollection,), {
+            'resource': resource,
+            'prefetch_related': False,
+            'streaming': streaming,
+            'chunk_size': 4,
+        })
+
+        queryset = model.objects.order_by('pk')
+        expected = resources.utils.convert_to_resource(queryset, resource=resource)
+
+        resolve = lambda: list(Collection.resolve_fields(queryset.all()))
+        self.assertEqual(resolve(), expected)
+        return resolve
+
+    def test_many_to_many(self):
+        resolve = self._test(models.Book, ('title', 'tags'))
+
+        # the books and the pks of the tags of all books
+        self.assertNumQueries(2, resolve)
+        self.assertEqual(resolve()[2]['tags'], [{'id': self.tag1.pk},
+            {'id': self.tag2.pk}])
+
+    def test_reverse(self):
+        self.assertNumQueries(2, self._test(models.Hacker, ('name', 'book_set')))
+        self.assertNumQueries(2, self._test(models.Tag, ('name', 'book_set')))
+
+    def test_streaming(self):
+        resolve = self._test(models.Book, ('title', 'tags'), streaming=True)
+
+        # each chunk of 4 books batches the tags
+        self.assertNumQueries(1 + 4, resolve)
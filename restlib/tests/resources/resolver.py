@@ -2,10 +2,13 @@ from datetime import date
 
 from restlib.tests import utils
 from restlib.tests import models
-from restlib.resources.model import get_or_create_resource
+from restlib import resources
+from restlib.resources import utils as resource_utils
+from restlib.resources.model import get_or_create_resource, ResourceMetaclass
 
 
-__all__ = ('FieldPseudoSelectorTestCase', 'ExcludePseudoSelectorTestCase')
+__all__ = ('FieldPseudoSelectorTestCase', 'ExcludePseudoSelectorTestCase',
+    'FieldPlanTestCase', 'RelatedResourceTestCase', 'ValuesListTestCase')
 
 
 class FieldPseudoSelectorTestCase(utils.BaseTestCase):
@@ -98,3 +101,169 @@ class ExcludePseudoSelectorTestCase(utils.BaseTestCase):
         self.assertEqual(TagResource.resolve_fields(self.tag1), {
             'name': 'javascript',
         })
+
+
+class FieldPlanTestCase(utils.BaseTestCase):
+    def test_kinds(self):
+        attrs = {
+            'fields': ('title', 'author', 'tags', 'pub_date->published',
+                '_get_pk_val->pk', 'slug'),
+            'slug': classmethod(lambda cls, obj: obj.title.lower()[:7]),
+        }
+
+        BookResource, created = get_or_create_resource(models.Book, **attrs)
+
+        kinds = [(x.key, x.kind) for x in BookResource._plan]
+        self.assertEqual(kinds, [
+            ('title', resource_utils.ATTRIBUTE),
+            ('author', resource_utils.RELATED),
+            ('tags', resource_utils.MANAGER),
+            ('published', resource_utils.ATTRIBUTE),
+            ('pk', resource_utils.CALLABLE),
+            ('slug', resource_utils.METHOD),
+        ])
+
+        self.assertEqual(BookResource._plan[0].model, None)
+        self.assertEqual(BookResource._plan[1].model, models.Hacker)
+        self.assertEqual(BookResource._plan[2].model, models.Tag)
+
+    def test_exclude(self):
+        attrs = {'fields': (':local', ('tags', 'name')), 'exclude': ('tags', 'title')}
+
+        BookResource, created = get_or_create_resource(models.Book, **attrs)
+
+        keys = sorted([x.key for x in BookResource._plan])
+        self.assertEqual(keys, ['author', 'id', 'pub_date'])
+
+    def test_resolve(self):
+        attrs = {
+            'fields': ('title->name', ('author', 'name'), 'slug'),
+            'slug': classmethod(lambda cls, obj: obj.title.lower()[:7]),
+        }
+
+        BookResource, created = get_or_create_resource(models.Book, **attrs)
+
+        self.assertEqual(BookResource.resolve_fields(self.book), {
+            'name': 'Secrets of a JavaScript Ninja',
+            'author': {'name': 'John Resig'},
+            'slug': 'secrets',
+        })
+
+
+class RelatedResourceTestCase(utils.BaseTestCase):
+    def test_memoized(self):
+        a, created = resource_utils.get_resource_for_model(models.Book,
+            fields=('title', ['tags', 'name']))
+        self.assertTrue(created)
+
+        b, created = resource_utils.get_resource_for_model(models.Book,
+            fields=('title', ('tags', 'name')))
+        self.assertFalse(created)
+        self.assertTrue(a is b)
+
+        c, created = resource_utils.get_resource_for_model(models.Book)
+        self.assertFalse(a is c)
+        self.assertEqual(c.fields, ('id',))
+
+    def test_default(self):
+        BookResource, created = get_or_create_resource(models.Book,
+            fields=('title', 'author'))
+        accessor = BookResource._plan[1]
+
+        # the pk fallback is memoized by the accessor
+        resource = resource_utils.get_nested_resource(accessor)
+        self.assertEqual(resource.fields, ('id',))
+        self.assertTrue(resource_utils.get_nested_resource(accessor) is resource)
+        self.assertEqual(resource_utils.is_pk_reference(accessor), True)
+
+        # until a default resource is defined for the model
+        class HackerResource(resources.ModelResource):
+            model = models.Hacker
+            fields = ('id', 'name')
+
+        self.assertTrue(resource_utils.get_nested_resource(accessor) is
+            HackerResource)
+        self.assertEqual(resource_utils.is_pk_reference(accessor), False)
+        self.assertEqual(BookResource.resolve_fields(self.book)['author'],
+            {'id': self.jresig.pk, 'name': 'John Resig'})
+
+    def test_nested(self):
+        attrs = {'fields': ('name', ('book_set', 'title', ('tags', 'name')))}
+        HackerResource, created = get_or_create_resource(models.Hacker, **attrs)
+
+        HackerResource.resolve_fields(self.jresig)
+        count = len(ResourceMetaclass._cache)
+
+        for i in xrange(3):
+            HackerResource.resolve_fields(self.jresig)
+
+        self.assertEqual(len(ResourceMetaclass._cache), count)
+
+    def test_pk_only(self):
+        BookResource, created = get_or_create_resource(models.Book,
+            fields=('title', 'author', ('tags', ':pk')))
+
+        book = models.Book.objects.get(pk=self.book.pk)
+
+        # the author is read from the local column and the tags are fetched
+        # using only their pks
+        self.assertNumQueries(1, BookResource.resolve_fields, book)
+        self.assertEqual(BookResource.resolve_fields(book), {
+            'title': 'Secrets of a JavaScript Ninja',
+            'author': {'id': self.jresig.pk},
+            'tags': [{'id': self.tag1.pk}],
+        })
+
+        self.assertEqual(resource_utils.get_related_lookups(BookResource._plan),
+            ((), ('tags',)))
+
+
+class ValuesListTestCase(utils.BaseTestCase):
+    def test_columns(self):
+        BookResource, created = get_or_create_resource(models.Book,
+            fields=('id', 'title->name', 'pub_date'))
+        self.assertEqual(BookResource._columns, ('id', 'title', 'pub_date'))
+
+        BookResource, created = get_or_create_resource(models.Book,
+            fields=('title', 'author'))
+        self.assertEqual(BookResource._columns, None)
+
+        # the values of the columns are converted by the descriptors
+        for field in ('file', 'keywords'):
+            DocumentResource, created = get_or_create_resource(models.Document,
+                fields=('title', field))
+            self.assertEqual(DocumentResource._columns, None)
+
+        DocumentResource, created = get_or_create_resource(models.Document,
+            fields=('id', 'title'))
+        self.assertEqual(DocumentResource._columns, ('id', 'title'))
+
+    def test_descriptors(self):
+        document = models.Document(title='Notes', file='documents/notes.txt',
+            keywords=['a', 'b'])
+        document.save()
+
+        DocumentResource, created = get_or_create_resource(models.Document,
+            fields=('title', 'keywords'))
+
+        self.assertEqual(DocumentResource.resolve_fields(
+            models.Document.objects.all()), [{
+                'title': 'Notes',
+                'keywords': ['a', 'b'],
+            }])
+
+    def test_resolve(self):
+        BookResource, created = get_or_create_resource(models.Book,
+            fields=('id', 'title->name', 'pub_date'))
+
+        queryset = models.Book.objects.all()
+
+        # model instances are used when the queryset is a list
+        expected = BookResource.resolve_fields(list(queryset))
+
+        self.assertEqual(BookResource.resolve_fields(queryset), expected)
+        self.assertEqual(expected, [{
+            'id': 1,
+            'name': 'Secrets of a JavaScript Ninja',
+            'pub_date': date(2011, 6, 1),
+        }])
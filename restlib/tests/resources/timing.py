@@ -0,0 +1,122 @@
+from django.http import HttpRequest
+from django.test import TestCase
+
+from restlib import http, resources
+from restlib.resources import timing
+
+
+__all__ = ('HistogramTestCase', 'TimingTestCase')
+
+
+class HistogramTestCase(TestCase):
+    def test_percentile(self):
+        histogram = timing.Histogram()
+        self.assertEqual(histogram.percentile(50), None)
+
+        for i in xrange(1, 1001):
+            histogram.add(i / 1000.0)
+
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.sum, 500.5)
+
+        # the estimates are within the error of the buckets
+        for percent in (50, 95, 99):
+            value = histogram.percentile(percent)
+            self.assertTrue(abs(value - percent / 100.0) < percent / 1000.0)
+
+    def test_overflow(self):
+        histogram = timing.Histogram(buckets=(1, 2))
+        histogram.add(0.5)
+        histogram.add(10)
+
+        self.assertEqual(histogram.counts, [1, 0, 1])
+        self.assertEqual(histogram.percentile(99), 2)
+
+
+class TimingTestCase(TestCase):
+    def setUp(self):
+        test = self
+
+        class Sink(timing.HistogramSink):
+            def record(self, resource, method, timings, response=None):
+                test.timings = timings
+                super(Sink, self).record(resource, method, timings, response)
+
+        class TimedResource(resources.Resource):
+            timing = True
+            server_timing = True
+
+            def GET(self, request):
+                return {'name': 'Python'}
+
+        class UntimedResource(resources.Resource):
+            def GET(self, request):
+                return {'name': 'Python'}
+
+        self.resource = TimedResource
+        self.untimed = UntimedResource
+
+        self._sinks = timing._sinks.copy()
+        self.sink = timing._sinks[timing.settings.TIMING_SINK] = Sink()
+
+    def tearDown(self):
+        timing._sinks.clear()
+        timing._sinks.update(self._sinks)
+
+    def _request(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT'] = 'application/json'
+        return request
+
+    def test_phases(self):
+        response = self.resource(self._request())
+        self.assertEqual(response.status_code, 200)
+
+        phases = [phase for phase, seconds in self.timings]
+        self.assertEqual(phases, ['request.MethodNotAllowed',
+            'request.NotAcceptable', 'request.SparseFieldsets',
+            'request.NotModified', 'handler', 'resolve', 'encode',
+            'response.NotModified', 'total'])
+
+        total = self.timings[-1][1]
+        self.assertTrue(sum([s for p, s in self.timings[:-1]]) <= total)
+
+        header = response['Server-Timing'].split(', ')
+        self.assertEqual(len(header), len(phases))
+        self.assertTrue(header[-1].startswith('total;dur='))
+
+    def test_short_circuit(self):
+        request = self._request()
+        request.META['HTTP_ACCEPT'] = 'text/html'
+
+        response = self.resource(request)
+        self.assertEqual(response.status_code, 406)
+
+        # the resource method is not called
+        phases = [phase for phase, seconds in self.timings]
+        self.assertEqual(phases, ['request.MethodNotAllowed',
+            'request.NotAcceptable', 'total'])
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    def test_disabled(self):
+        request = self._request()
+        response = self.untimed(request)
+
+        self.assertFalse(hasattr(request, 'resource_timings'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_percentiles(self):
+        self.assertEqual(timing.get_percentiles(self.resource, 'GET'),
+            {'p50': None, 'p95': None, 'p99': None})
+
+        for i in xrange(10):
+            self.resource(self._request())
+
+        percentiles = self.sink.percentiles(self.resource, 'GET')
+        self.assertEqual(sorted(percentiles), ['p50', 'p95', 'p99'])
+        self.assertTrue(0 < percentiles['p50'] <= percentiles['p95'] <=
+            percentiles['p99'])
+
+        histogram = self.sink.get_histogram(self.resource, 'GET', 'handler')
+        self.assertEqual(histogram.count, 10)
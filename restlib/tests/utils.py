@@ -3,6 +3,7 @@ from datetime import date
 from django.test import TestCase
 
 from restlib.tests import models
+from restlib.resources import utils
 from restlib.resources.model import (ResourceMetaclass,
     ModelResourceMetaclass)
 
@@ -11,8 +12,11 @@ class BaseTestCase(TestCase):
 
         self.old_defaults = ModelResourceMetaclass._defaults
         self.old_cache = ResourceMetaclass._cache
+        self.old_related = ModelResourceMetaclass._related
         ModelResourceMetaclass._defaults = {}
+        ModelResourceMetaclass._related = {}
         ResourceMetaclass._cache = {}
+        utils.clear_nested_resources()
 
         self.jresig = models.Hacker(name='John Resig', website='http://ejohn.org')
         self.jresig.save()
@@ -37,4 +41,6 @@ class BaseTestCase(TestCase):
     def tearDown(self):
         ModelResourceMetaclass._defaults = self.old_defaults
         ResourceMetaclass._cache = self.old_cache
+        ModelResourceMetaclass._related = self.old_related
+        utils.clear_nested_resources()
 
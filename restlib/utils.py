@@ -1,3 +1,6 @@
+from django.core import exceptions
+from django.utils.importlib import import_module
+
 def uncamel(s):
     """Uncamel-cases a string. Returns a list of the parts.
 
@@ -17,3 +20,25 @@ def uncamel(s):
     if tmp:
         toks.append(tmp)
     return toks
+
+
+def import_class(path, kind):
+    """Imports the class referenced by the dotted ``path``, e.g. a middleware
+    or cache backend. ``kind`` describes the class in the error messages.
+    """
+    try:
+        dot = path.rindex('.')
+    except ValueError:
+        raise exceptions.ImproperlyConfigured('%s isn\'t a %s module' % (path, kind))
+
+    module, classname = path[:dot], path[dot+1:]
+
+    try:
+        mod = import_module(module)
+    except ImportError, e:
+        raise exceptions.ImproperlyConfigured('Error importing %s %s: "%s"' % (kind, module, e))
+
+    try:
+        return getattr(mod, classname)
+    except AttributeError:
+        raise exceptions.ImproperlyConfigured('%s module "%s" does not define a "%s" class' % (kind.capitalize(), module, classname))